@@ -0,0 +1,317 @@
+"""
+Кеш-бэкенды Django поверх общего сетевого хранилища с протоколом RESP.
+
+RedisCache — обычный бэкенд: все процессы видят одни и те же ключи.
+NearCache — двухуровневый: перед общим хранилищем стоит локальный
+кеш процесса с коротким временем жизни. Записи и удаления рассылаются
+остальным процессам через pub/sub, и они сразу вычищают ключ у себя.
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .client import Connection, RespError, parse_url
+
+INVALIDATION_CHANNEL = 'yatube:invalidate'
+FLUSH_MESSAGE = b'*'
+# INCRBY только существующего ключа одним шагом на сервере: ключ,
+# истёкший между проверкой и INCRBY, не создаётся заново.
+INCR_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end"
+)
+
+
+class RedisCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._connection_params = parse_url(server)
+        self._connection_params['timeout'] = options.get(
+            'SOCKET_TIMEOUT', 5
+        )
+        self._location = server
+        # Экземпляры бэкенда создаются на каждый поток,
+        # поэтому соединение у каждого своё.
+        self._connection = Connection(**self._connection_params)
+
+    def _serialize(self, value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _deserialize(self, data):
+        if data is None:
+            return None
+        if data[:1] == b'\x80':
+            return pickle.loads(data)
+        return int(data)
+
+    def _expiry_args(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return ()
+        return ('PX', max(int(timeout * 1000), 1))
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _publish(self, *keys):
+        pass
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is not None and timeout != DEFAULT_TIMEOUT \
+                and timeout <= 0:
+            return False
+        key = self._key(key, version)
+        added = self._connection.execute(
+            'SET', key, self._serialize(value), 'NX',
+            *self._expiry_args(timeout)
+        )
+        if added:
+            self._publish(key)
+        return added is not None
+
+    def get(self, key, default=None, version=None):
+        value = self._deserialize(self._fetch(self._key(key, version)))
+        return default if value is None else value
+
+    def _fetch(self, key):
+        return self._connection.execute('GET', key)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout is not None and timeout != DEFAULT_TIMEOUT \
+                and timeout <= 0:
+            self._connection.execute('DEL', key)
+        else:
+            self._connection.execute(
+                'SET', key, self._serialize(value),
+                *self._expiry_args(timeout)
+            )
+        self._publish(key)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry_args(timeout)
+        if expiry:
+            return bool(self._connection.execute('PEXPIRE', key, expiry[1]))
+        return bool(self._connection.execute('EXISTS', key)) and (
+            self._connection.execute('PERSIST', key) is not None
+        )
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._connection.execute('DEL', key)
+        self._publish(key)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        made = OrderedDict((self._key(key, version), key) for key in keys)
+        values = self._connection.execute('MGET', *made)
+        return {
+            made[made_key]: self._deserialize(data)
+            for made_key, data in zip(made, values)
+            if data is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        if timeout is not None and timeout != DEFAULT_TIMEOUT \
+                and timeout <= 0:
+            self.delete_many(data, version=version)
+            return []
+        expiry = self._expiry_args(timeout)
+        keys = [self._key(key, version) for key in data]
+        self._connection.pipeline([
+            ('SET', key, self._serialize(value), *expiry)
+            for key, value in zip(keys, data.values())
+        ])
+        self._publish(*keys)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._connection.execute('DEL', *keys)
+            self._publish(*keys)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return bool(self._connection.execute('EXISTS', key))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        try:
+            value = self._connection.execute(
+                'EVAL', INCR_SCRIPT, 1, key, delta
+            )
+        except RespError as error:
+            raise ValueError(str(error))
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        self._publish(key)
+        return value
+
+    def clear(self):
+        self._connection.execute('FLUSHDB')
+        self._publish(FLUSH_MESSAGE)
+
+    def close(self, **kwargs):
+        # Соединение живёт дольше запроса: переподключение на каждом
+        # запросе съело бы весь выигрыш от общего кеша.
+        pass
+
+
+class LocalTier:
+    """Потокобезопасный LRU-кеш процесса с ограниченным временем жизни."""
+
+    def __init__(self, timeout, max_entries):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.origin = uuid.uuid4().hex.encode()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def evict(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class Invalidator(threading.Thread):
+    """
+    Фоновый подписчик: получает ключи, изменённые другими процессами,
+    и вычищает их из локального уровня. Собственные сообщения
+    пропускаются: свои ключи процесс вычищает сразу при записи.
+    Пока подписка не работает,
+    локальный уровень очищается, чтобы не отдавать устаревшие данные.
+    """
+    daemon = True
+    retry_delay = 1
+
+    def __init__(self, tier, connection_params):
+        super().__init__(name='near-cache-invalidator')
+        self.tier = tier
+        self.connection_params = connection_params
+        self.ready = threading.Event()
+
+    def run(self):
+        while True:
+            connection = Connection(**dict(
+                self.connection_params, timeout=None
+            ))
+            try:
+                connection.subscribe(INVALIDATION_CHANNEL)
+                self.ready.set()
+                self._listen(connection)
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                self.ready.clear()
+                self.tier.clear()
+                connection.disconnect()
+            time.sleep(self.retry_delay)
+
+    def _listen(self, connection):
+        while True:
+            message = connection.read_message()
+            if message is None:
+                continue
+            origin, *keys = message[1].split(b'\n')
+            if origin == self.tier.origin:
+                continue
+            for key in keys:
+                if key == FLUSH_MESSAGE:
+                    self.tier.clear()
+                else:
+                    self.tier.evict(key.decode())
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class NearCache(RedisCache):
+    """
+    Общий кеш с локальным уровнем в каждом процессе.
+
+    OPTIONS:
+        NEAR_TIMEOUT — сколько секунд значение живёт локально (5);
+        NEAR_MAX_ENTRIES — размер локального уровня (1000);
+        NEAR_NAME — имя локального уровня; процессы с одним именем
+        делят его (по умолчанию адрес хранилища).
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        options = params.get('OPTIONS', {})
+        name = options.get('NEAR_NAME', server)
+        with _tiers_lock:
+            if name not in _tiers:
+                tier = LocalTier(
+                    options.get('NEAR_TIMEOUT', 5),
+                    options.get('NEAR_MAX_ENTRIES', 1000)
+                )
+                tier.invalidator = Invalidator(tier, self._connection_params)
+                tier.invalidator.start()
+                _tiers[name] = tier
+        self._tier = _tiers[name]
+
+    def _publish(self, *keys):
+        if FLUSH_MESSAGE in keys:
+            self._tier.clear()
+        for key in keys:
+            self._tier.evict(key)
+        self._connection.execute(
+            'PUBLISH',
+            INVALIDATION_CHANNEL,
+            b'\n'.join([self._tier.origin] + [
+                key if isinstance(key, bytes) else key.encode()
+                for key in keys
+            ])
+        )
+
+    def _fetch(self, key):
+        data = self._tier.get(key)
+        if data is None:
+            data = super()._fetch(key)
+            # Без подписки не узнать об изменениях в других процессах,
+            # поэтому локально кешируем только при работающей подписке.
+            if data is not None and self._tier.invalidator.ready.is_set():
+                self._tier.set(key, data)
+        return data
+
+    def has_key(self, key, version=None):
+        return self._fetch(self._key(key, version)) is not None
@@ -0,0 +1,176 @@
+"""
+Минимальный клиент протокола RESP (Redis и совместимые хранилища).
+
+Поддерживает ровно то, что нужно кеш-бэкенду: команды, конвейер
+(pipeline) и чтение сообщений подписки.
+"""
+import select
+import socket
+from urllib.parse import unquote, urlparse
+
+DEFAULT_PORT = 6379
+# Команды, повтор которых после обрыва не меняет данные. INCRBY
+# или PUBLISH, дошедшие до сервера, повтор выполнил бы дважды.
+IDEMPOTENT_COMMANDS = frozenset({
+    'AUTH', 'DEL', 'EXISTS', 'FLUSHDB', 'GET', 'MGET', 'PERSIST',
+    'PEXPIRE', 'PING', 'SELECT', 'SET',
+})
+
+
+class RespError(Exception):
+    pass
+
+
+def parse_url(url):
+    """redis://[:password@]host[:port][/db] -> параметры подключения."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ('redis', 'resp'):
+        raise ValueError(f'Неподдерживаемая схема адреса кеша: {url}')
+    path = parsed.path.strip('/')
+    return {
+        'host': parsed.hostname or 'localhost',
+        'port': parsed.port or DEFAULT_PORT,
+        'db': int(path) if path else 0,
+        'password': unquote(parsed.password) if parsed.password else None,
+    }
+
+
+def encode_command(args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def is_idempotent(args):
+    name = args[0].upper()
+    if name == 'SET':
+        # SET NX после дошедшего SET NX ответил бы, что ключ занят.
+        return not {'NX', 'XX'} & {
+            arg.upper() for arg in args[3:] if isinstance(arg, str)
+        }
+    return name in IDEMPOTENT_COMMANDS
+
+
+def read_reply(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('Соединение с сервером кеша закрыто')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode()
+    if kind == b'-':
+        return RespError(payload.decode())
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length == -1:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(payload)
+        if length == -1:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise RespError(f'Неизвестный ответ сервера: {line!r}')
+
+
+class Connection:
+    def __init__(self, host, port, db=0, password=None, timeout=None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock = None
+        self._stream = None
+
+    def connect(self):
+        if self._sock is not None:
+            return
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout
+        )
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._stream = sock.makefile('rb')
+        try:
+            if self.password:
+                self._call(('AUTH', self.password))
+            if self.db:
+                self._call(('SELECT', self.db))
+        except Exception:
+            self.disconnect()
+            raise
+
+    def disconnect(self):
+        if self._sock is None:
+            return
+        try:
+            self._stream.close()
+            self._sock.close()
+        finally:
+            self._sock = None
+            self._stream = None
+
+    def is_stale(self):
+        """Сервер закрыл простаивавшее соединение: в сокете ждёт EOF."""
+        readable, _, _ = select.select([self._sock], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return not self._sock.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def _call(self, args):
+        return self._pipeline([args])[0]
+
+    def _pipeline(self, commands):
+        self._sock.sendall(b''.join(encode_command(c) for c in commands))
+        replies = [read_reply(self._stream) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def pipeline(self, commands):
+        """
+        Отправляет команды одним пакетом и возвращает ответы.
+        Соединение, которое закрыл сервер, заменяется до отправки.
+        Обрыв после отправки повторяется один раз, и только если все
+        команды идемпотентны: остальные могли уже выполниться.
+        """
+        if self._sock is not None and self.is_stale():
+            self.disconnect()
+        retry = all(map(is_idempotent, commands))
+        for attempt in (1, 2):
+            self.connect()
+            try:
+                return self._pipeline(commands)
+            except (ConnectionError, socket.timeout, OSError):
+                self.disconnect()
+                if attempt == 2 or not retry:
+                    raise
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def subscribe(self, channel):
+        self.connect()
+        self._sock.settimeout(None)
+        self._sock.sendall(encode_command(('SUBSCRIBE', channel)))
+        read_reply(self._stream)
+
+    def read_message(self):
+        """Ждёт следующее сообщение подписки: (канал, данные)."""
+        reply = read_reply(self._stream)
+        if isinstance(reply, list) and reply[0] == b'message':
+            return reply[1], reply[2]
+        return None
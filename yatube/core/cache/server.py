@@ -0,0 +1,229 @@
+"""
+Встроенный сервер с подмножеством протокола RESP.
+
+Нужен тестам и локальной разработке, чтобы проверять общий кеш
+и рассылку инвалидаций между процессами без внешнего Redis.
+Данные живут в памяти процесса, в котором запущен сервер.
+"""
+import socketserver
+import threading
+import time
+
+from .backends import INCR_SCRIPT
+from .client import RespError, read_reply
+
+
+def encode_reply(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, RespError):
+        return b'-%s\r\n' % str(reply).encode()
+    if isinstance(reply, bool):
+        return b':%d\r\n' % reply
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(map(encode_reply, reply))
+
+
+class Storage:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.databases = {}
+        self.subscribers = {}
+
+    def db(self, number):
+        return self.databases.setdefault(number, {})
+
+    def get(self, db, key):
+        item = db.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del db[key]
+            return None
+        return value
+
+    def expiry(self, db, key):
+        return db[key][1]
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.storage = self.server.storage
+        self.db_number = 0
+        self.write_lock = threading.Lock()
+
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except ConnectionError:
+                return
+            if not isinstance(command, list) or not command:
+                self.send(RespError('ERR protocol error'))
+                continue
+            name = command[0].decode().upper()
+            handler = getattr(self, 'cmd_' + name.lower(), None)
+            if handler is None:
+                reply = RespError(f"ERR unknown command '{name}'")
+            else:
+                with self.storage.lock:
+                    try:
+                        reply = handler(*command[1:])
+                    except (TypeError, ValueError) as error:
+                        reply = RespError(f'ERR {error}')
+            if reply is not NotImplemented:
+                self.send(reply)
+
+    def finish(self):
+        with self.storage.lock:
+            for handlers in self.storage.subscribers.values():
+                handlers.discard(self)
+        super().finish()
+
+    def send(self, reply):
+        with self.write_lock:
+            self.wfile.write(encode_reply(reply))
+            self.wfile.flush()
+
+    @property
+    def db(self):
+        return self.storage.db(self.db_number)
+
+    def cmd_ping(self, *args):
+        return 'PONG'
+
+    def cmd_auth(self, *args):
+        return 'OK'
+
+    def cmd_select(self, number):
+        self.db_number = int(number)
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.storage.get(self.db, key)
+
+    def cmd_mget(self, *keys):
+        return [self.storage.get(self.db, key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        expires = None
+        for unit, scale in ((b'EX', 1), (b'PX', 0.001)):
+            if unit in options:
+                ttl = int(options[options.index(unit) + 1]) * scale
+                expires = time.monotonic() + ttl
+        exists = self.storage.get(self.db, key) is not None
+        if b'NX' in options and exists or b'XX' in options and not exists:
+            return None
+        self.db[key] = (value, expires)
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        return sum(
+            self.storage.get(self.db, key) is not None
+            and self.db.pop(key) is not None
+            for key in keys
+        )
+
+    def cmd_exists(self, *keys):
+        return sum(self.storage.get(self.db, key) is not None for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        value = self.storage.get(self.db, key)
+        expires = self.storage.expiry(self.db, key) if value else None
+        try:
+            value = int(value or 0) + int(delta)
+        except ValueError:
+            return RespError('ERR value is not an integer or out of range')
+        self.db[key] = (str(value).encode(), expires)
+        return value
+
+    def cmd_eval(self, script, number, *args):
+        # Lua не исполняется: сервер знает только скрипты бэкендов.
+        handler = SCRIPTS.get(script)
+        if handler is None:
+            return RespError('NOSCRIPT Unknown script')
+        number = int(number)
+        return handler(self, args[:number], args[number:])
+
+    def script_incr(self, keys, argv):
+        if self.storage.get(self.db, keys[0]) is None:
+            return None
+        return self.cmd_incrby(keys[0], argv[0])
+
+    def cmd_pexpire(self, key, milliseconds):
+        value = self.storage.get(self.db, key)
+        if value is None:
+            return 0
+        self.db[key] = (value, time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def cmd_persist(self, key):
+        value = self.storage.get(self.db, key)
+        if value is None:
+            return 0
+        self.db[key] = (value, None)
+        return 1
+
+    def cmd_flushdb(self):
+        self.db.clear()
+        return 'OK'
+
+    def cmd_publish(self, channel, message):
+        handlers = list(self.storage.subscribers.get(channel, ()))
+        for handler in handlers:
+            handler.send([b'message', channel, message])
+        return len(handlers)
+
+    def cmd_subscribe(self, channel):
+        self.storage.subscribers.setdefault(channel, set()).add(self)
+        self.send([b'subscribe', channel, 1])
+        return NotImplemented
+
+
+SCRIPTS = {INCR_SCRIPT.encode(): RequestHandler.script_incr}
+
+
+class FakeRespServer(socketserver.ThreadingTCPServer):
+    """
+    Запускается в фоновом потоке на свободном порту:
+
+        with FakeRespServer() as server:
+            CACHES = {'default': {..., 'LOCATION': server.url}}
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), RequestHandler)
+        self.storage = Storage()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, name='fake-resp-server', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,153 @@
+import socket
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.cache.backends import NearCache, RedisCache
+from core.cache.client import Connection, parse_url
+from core.cache.server import FakeRespServer
+
+
+class RedisCacheTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRespServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = RedisCache(self.server.url, {'TIMEOUT': 60})
+        self.cache.clear()
+
+    def test_set_get_delete(self):
+        """Значения переживают сериализацию и удаляются."""
+        self.cache.set('post', {'id': 1, 'text': 'Привет'})
+        self.assertEqual(self.cache.get('post'), {'id': 1, 'text': 'Привет'})
+        self.cache.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+        self.assertEqual(self.cache.get('post', 'нет'), 'нет')
+
+    def test_add_and_incr(self):
+        """add не перезаписывает ключ, incr работает атомарно в хранилище."""
+        self.assertTrue(self.cache.add('version', 1))
+        self.assertFalse(self.cache.add('version', 5))
+        self.assertEqual(self.cache.incr('version'), 2)
+        self.assertEqual(self.cache.get('version'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_does_not_revive_expired_key(self):
+        """incr истёкшего ключа — ValueError, ключ не создаётся."""
+        self.cache.set('version', 1, timeout=0.05)
+        time.sleep(0.1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('version')
+        self.assertIsNone(self.cache.get('version'))
+
+    def test_many_and_timeout(self):
+        """Пакетные операции и истечение времени жизни."""
+        self.cache.set_many({'a': 1, 'b': [2]}, timeout=0.05)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': [2]})
+        time.sleep(0.1)
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_get_or_set(self):
+        """get_or_set из BaseCache работает поверх бэкенда."""
+        self.assertEqual(self.cache.get_or_set('key', lambda: 42), 42)
+        self.assertEqual(self.cache.get_or_set('key', 0), 42)
+
+
+class ConnectionTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRespServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.connection = Connection(**parse_url(self.server.url))
+        self.addCleanup(self.connection.disconnect)
+
+    def test_only_idempotent_commands_are_retried(self):
+        """После обрыва повторяются только идемпотентные команды."""
+        with mock.patch.object(Connection, '_pipeline',
+                               side_effect=ConnectionError) as send:
+            with self.assertRaises(ConnectionError):
+                self.connection.execute('INCRBY', 'counter', 1)
+            self.assertEqual(send.call_count, 1)
+            with self.assertRaises(ConnectionError):
+                self.connection.execute('SET', 'version', 1, 'NX')
+            self.assertEqual(send.call_count, 2)
+            with self.assertRaises(ConnectionError):
+                self.connection.execute('GET', 'counter')
+            self.assertEqual(send.call_count, 4)
+
+    def test_closed_connection_is_replaced_before_sending(self):
+        """Соединение, закрытое сервером, заменяется до отправки."""
+        ours, theirs = socket.socketpair()
+        self.addCleanup(ours.close)
+        self.connection._sock = ours
+        self.assertFalse(self.connection.is_stale())
+        theirs.close()
+        self.assertTrue(self.connection.is_stale())
+        self.connection._stream = ours.makefile('rb')
+        self.assertEqual(self.connection.execute('INCRBY', 'counter', 1), 1)
+
+
+class NearCacheTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRespServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def make_worker(self, name):
+        worker = NearCache(
+            self.server.url,
+            {'OPTIONS': {'NEAR_NAME': name, 'NEAR_TIMEOUT': 60}}
+        )
+        self.assertTrue(worker._tier.invalidator.ready.wait(5))
+        return worker
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('Инвалидация не дошла до второго процесса')
+            time.sleep(0.01)
+
+    def test_local_tier_serves_repeated_reads(self):
+        """Повторное чтение обслуживается локальным уровнем."""
+        worker = self.make_worker('local-tier')
+        worker.set('feed', [1, 2, 3])
+        self.assertEqual(worker.get('feed'), [1, 2, 3])
+        self.server.storage.db(0).clear()
+        self.assertEqual(worker.get('feed'), [1, 2, 3])
+
+    def test_invalidation_reaches_other_workers(self):
+        """Запись в одном процессе сбрасывает локальный кеш в другом."""
+        first = self.make_worker('worker-1')
+        second = self.make_worker('worker-2')
+        first.set('feed_version', 1)
+        self.assertEqual(second.get('feed_version'), 1)
+        first.incr('feed_version')
+        self.wait_for(lambda: second.get('feed_version') == 2)
+        first.delete('feed_version')
+        self.wait_for(lambda: second.get('feed_version') is None)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, Tag
 
 EMPTY = '-пусто-'
 
@@ -23,6 +23,7 @@ class GroupAdmin(admin.ModelAdmin):
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('text', 'post', 'author', 'created')
+    raw_id_fields = ('parent',)
     search_fields = ('text',)
     empty_value_display = EMPTY
 
@@ -32,3 +33,9 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
     search_fields = ('user',)
     empty_value_display = EMPTY
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
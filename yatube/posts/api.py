@@ -0,0 +1,162 @@
+"""
+JSON API только для чтения: ленты, пост с комментариями, профиль.
+
+Ответы собираются теми же запросами, что и HTML-страницы
+(for_feed, CursorPaginator, кеш страниц ленты), и сериализуются
+компактно. У каждого ответа есть сильный ETag и Last-Modified
+из версий кеша (posts.caching): повторный опрос без изменений
+получает 304 после одного обращения к кешу, без запросов к базе.
+"""
+import datetime
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from .caching import (FEED_VERSION_KEY, PROFILE_VERSION_KEY, cached_page,
+                      get_request_versions)
+from .counters import get_author_stats
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator
+
+API_VERSION = 'v1'
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder,
+                        json_dumps_params=JSON_PARAMS)
+
+
+def api_view(*keys):
+    """
+    GET-обработчик API. ETag — хеш версий keys и полного пути
+    запроса, Last-Modified — время изменения версий. Http404
+    отдаётся в JSON, а не HTML-страницей.
+    """
+    def etag(request, *args, **kwargs):
+        versions, _ = get_request_versions(request, *keys)
+        raw = ':'.join(
+            [API_VERSION, request.get_full_path(), *map(str, versions)]
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        _, modified = get_request_versions(request, *keys)
+        return datetime.datetime.fromtimestamp(
+            modified, datetime.timezone.utc
+        )
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return json_response({'detail': 'Не найдено'}, status=404)
+        conditional = condition(etag_func=etag,
+                                last_modified_func=last_modified)
+        return require_safe(cache_control(no_cache=True)(conditional(wrapper)))
+    return decorator
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'comment_count': post.comment_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created,
+        'author': comment.author.username,
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+    }
+
+
+def serialize_page(request, page, serialize):
+    """Страница CursorPaginator: записи и ссылки на соседние страницы."""
+    def link(cursor):
+        return f'{request.path}?cursor={cursor}' if cursor else None
+
+    return {
+        'results': [serialize(obj) for obj in page.object_list],
+        'next': link(page.paginator.next_cursor),
+        'previous': link(page.paginator.previous_cursor),
+    }
+
+
+def get_feed_page(request, post_list):
+    return CursorPaginator(
+        post_list, settings.POSTS_PER_PAGE
+    ).get_page(request.GET.get('cursor'))
+
+
+@api_view(FEED_VERSION_KEY)
+def index(request):
+    # Кеш страниц отдельный от HTML-ленты: ?page= здесь не работает.
+    page = cached_page(
+        request,
+        'api:index',
+        lambda: get_feed_page(request, Post.objects.for_feed())
+    )
+    return json_response(serialize_page(request, page, serialize_post))
+
+
+@api_view(FEED_VERSION_KEY)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    page = get_feed_page(request, group.posts.for_feed())
+    return json_response(serialize_page(request, page, serialize_post))
+
+
+@api_view(FEED_VERSION_KEY)
+def user_posts(request, username):
+    user = get_object_or_404(User, username=username)
+    page = get_feed_page(request, Post.objects.filter(author=user).for_feed())
+    return json_response(serialize_page(request, page, serialize_post))
+
+
+@api_view(FEED_VERSION_KEY, PROFILE_VERSION_KEY)
+def profile(request, username):
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = get_author_stats(user)
+    return json_response({
+        'username': user.username,
+        'full_name': user.get_full_name(),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+        'posts': reverse('api:user_posts', args=[user.username]),
+    })
+
+
+@api_view(FEED_VERSION_KEY)
+def post(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    comments = CursorPaginator(
+        Comment.objects.thread(post.pk),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('path',)
+    ).get_page(request.GET.get('cursor'))
+    return json_response({
+        **serialize_post(post),
+        'comments': serialize_page(request, comments, serialize_comment),
+    })
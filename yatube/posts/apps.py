@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class PostConfig(AppConfig):
-    name = 'post'
+    name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa
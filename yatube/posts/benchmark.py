@@ -0,0 +1,144 @@
+"""
+Замеры числа запросов, задержки и памяти для представлений posts.
+
+Каждое представление вызывается через тестовый клиент; результаты
+собираются в словарь, который сохраняется в JSON и сравнивается
+с отчётом другого коммита.
+"""
+import datetime
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Follow, Group, Post, User
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу: share=0.95 для p95."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_scenarios():
+    """
+    Запросы к представлениям: имя, метод, адрес и данные формы.
+    Пользователь сценариев подписан на кого-нибудь, пост берётся
+    самый комментируемый.
+    """
+    follow = Follow.objects.order_by('pk').first()
+    reader = follow.user if follow else User.objects.order_by('pk').first()
+    post = Post.objects.select_related('author').order_by(
+        '-comment_count', 'pk'
+    ).first()
+    group = Group.objects.order_by('pk').first()
+    author = post.author.username
+    scenarios = [
+        ('index', 'get', reverse('posts:index'), None),
+        ('profile', 'get', reverse('posts:profile', args=[author]), None),
+        ('post_view', 'get',
+         reverse('posts:post', args=[author, post.pk]), None),
+        ('follow_index', 'get', reverse('posts:follow_index'), None),
+        ('add_comment', 'post',
+         reverse('posts:add_comment', args=[author, post.pk]),
+         {'text': 'Комментарий из замера'}),
+    ]
+    if group is not None:
+        scenarios.insert(1, (
+            'group_posts', 'get',
+            reverse('posts:group', args=[group.slug]), None
+        ))
+    return reader, scenarios
+
+
+def measure(client, method, url, data, repeat, warm_cache):
+    call = getattr(client, method)
+    timings = []
+    for _ in range(repeat):
+        if not warm_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = call(url, data)
+            timings.append((time.perf_counter() - start) * 1000)
+        query_count = len(queries)
+    if not warm_cache:
+        cache.clear()
+    tracemalloc.start()
+    call(url, data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'queries': query_count,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(repeat=20, warm_cache=False, volumes=None):
+    """
+    Замеряет все сценарии на уже заполненной базе. Число запросов
+    берётся по последнему повтору, память — по отдельному вызову
+    под tracemalloc, чтобы трассировка не искажала задержку.
+    """
+    reader, scenarios = get_scenarios()
+    client = Client()
+    client.force_login(reader)
+    return {
+        'commit': get_commit(),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'repeat': repeat,
+        'warm_cache': warm_cache,
+        'volumes': volumes,
+        'views': {
+            name: measure(client, method, url, data, repeat, warm_cache)
+            for name, method, url, data in scenarios
+        },
+    }
+
+
+def compare(baseline, report, tolerance=0.2):
+    """
+    Регрессии относительно baseline: любой рост числа запросов
+    и рост p95 больше чем на долю tolerance.
+    """
+    regressions = []
+    for name, current in report['views'].items():
+        previous = baseline['views'].get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f"{name}: запросов {previous['queries']} → "
+                f"{current['queries']}"
+            )
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']} → {current['p95_ms']} мс"
+            )
+    return regressions
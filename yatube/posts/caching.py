@@ -0,0 +1,163 @@
+"""
+Кеш страниц лент с версионированием.
+
+Ключ страницы включает глобальную версию лент. Сигналы сохранения
+и удаления постов и комментариев увеличивают версию, поэтому все
+закешированные страницы становятся недоступны сразу, без ожидания
+таймаута; устаревшие ключи просто вытесняются из кеша.
+
+Те же версии и время их изменения служат ETag и Last-Modified
+для условных запросов к API (см. posts.api).
+"""
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'feed_version'
+# Подписки меняют только счётчики профилей, ленты от них не зависят.
+PROFILE_VERSION_KEY = 'profile_version'
+# Версия одного автора: его имя и счётчики (см. posts.profiles).
+AUTHOR_VERSION_KEY = 'author_version:{}'
+MODIFIED_KEY = '{key}:modified'
+FEED_PAGE_KEY = 'feed_page:{name}:{version}:{mode}:{position}'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Начинаем с метки времени, чтобы после вытеснения счётчика
+        # не вернуться к версии, страницы которой ещё лежат в кеше.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_version(key)
+
+
+def bump_version(key):
+    _incr_version(key)
+    cache.set(MODIFIED_KEY.format(key=key), time.time(), timeout=None)
+
+
+def get_modified(key):
+    """Время последнего изменения версии key (метка Unix)."""
+    modified_key = MODIFIED_KEY.format(key=key)
+    modified = cache.get(modified_key)
+    if modified is None:
+        cache.add(modified_key, time.time(), timeout=None)
+        modified = cache.get(modified_key)
+    return modified
+
+
+def get_versions(*keys):
+    """
+    Версии keys и время последнего изменения любой из них.
+    Обычно это одно обращение к кешу и ни одного к базе.
+    """
+    modified_keys = [MODIFIED_KEY.format(key=key) for key in keys]
+    values = cache.get_many([*keys, *modified_keys])
+    versions = [values.get(key) or get_version(key) for key in keys]
+    modified = max(
+        values.get(modified_key) or get_modified(key)
+        for key, modified_key in zip(keys, modified_keys)
+    )
+    return versions, modified
+
+
+def get_request_versions(request, *keys):
+    """get_versions(*keys), прочитанные один раз за запрос."""
+    state = request.__dict__.setdefault('_versions', {})
+    if keys not in state:
+        state[keys] = get_versions(*keys)
+    return state[keys]
+
+
+def get_feed_version():
+    return get_version(FEED_VERSION_KEY)
+
+
+def bump_feed_version():
+    bump_version(FEED_VERSION_KEY)
+
+
+def bump_profile_version():
+    bump_version(PROFILE_VERSION_KEY)
+
+
+def get_author_version(author_id):
+    return get_version(AUTHOR_VERSION_KEY.format(author_id))
+
+
+def bump_author_version(author_id):
+    _incr_version(AUTHOR_VERSION_KEY.format(author_id))
+
+
+def forget_author_versions(author_ids):
+    """
+    Сбрасывает версии авторов пачкой: следующая версия начнётся
+    с новой метки времени (см. get_version), то есть будет больше.
+    """
+    cache.delete_many([AUTHOR_VERSION_KEY.format(pk) for pk in author_ids])
+
+
+def _freeze(page):
+    """
+    Копия страницы, пригодная для кеша: вместо queryset-а только
+    загруженные объекты и уже посчитанные параметры paginator-а.
+    """
+    paginator = copy.copy(page.paginator)
+    if not getattr(paginator, 'is_cursor', False):
+        paginator.num_pages
+    elif paginator.approximate_count:
+        paginator.count
+    paginator.object_list = ()
+    return type(page)(list(page.object_list), page.number, paginator)
+
+
+def requested_position(request):
+    """Страница из запроса, как её выбирает paginate: курсор или номер."""
+    if 'cursor' in request.GET:
+        return 'cursor', request.GET['cursor']
+    if 'page' in request.GET:
+        return 'page', request.GET['page']
+    return 'cursor', ''
+
+
+def page_position(page):
+    """Страница, которую на самом деле выбрал paginator."""
+    if getattr(page.paginator, 'is_cursor', False):
+        return 'cursor', page.paginator.cursor or ''
+    return 'page', str(page.number)
+
+
+def cached_page(request, name, build_page):
+    """
+    Страница ленты name для текущих ?page= и ?cursor=. При промахе
+    строится вызовом build_page(), в кеш попадает только она — под
+    номером или курсором, который принял paginator. Запросы с мусором
+    в параметрах, например ?page=abc или ?page=100500, в кеш
+    не попадают и новых ключей не создают.
+    """
+    version = get_feed_version()
+    mode, position = requested_position(request)
+    page = cache.get(FEED_PAGE_KEY.format(
+        name=name, version=version, mode=mode, position=position
+    ))
+    if page is None:
+        page = _freeze(build_page())
+        mode, position = page_position(page)
+        cache.set(
+            FEED_PAGE_KEY.format(
+                name=name, version=version, mode=mode, position=position
+            ),
+            page,
+            timeout=settings.FEED_PAGE_CACHE_TIMEOUT
+        )
+    return page
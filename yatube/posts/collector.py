@@ -0,0 +1,316 @@
+"""
+Сборка мусора в медиафайлах.
+
+Обычно файл картинки удаляется вместе с последним постом, который на
+него ссылается (см. posts.media). На диске всё равно остаются сироты:
+файлы из времён до хранилища по содержимому, недописанные загрузки,
+варианты картинок после ручных правок базы, миниатюры sorl-thumbnail
+из времён до фоновых вариантов. MediaCollector обходит каталоги
+картинок, вариантов и миниатюр потоково, через os.scandir, и сверяет
+найденное с Post.image пачками запросов.
+
+Каталоги обходятся в порядке сортировки путей. После каждого
+обработанного каталога его путь записывается в контрольную точку,
+и следующий запуск продолжает с того же места.
+"""
+import json
+import os
+import re
+import time
+
+from django.core.files.storage import default_storage
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.default import kvstore
+
+from . import media, thumbnails
+from .models import Post
+
+TEMP_PREFIX = '.upload-'
+VARIANTS_NAME = re.compile(r'^[0-9a-f]{32}$')
+# Миниатюры sorl лежат в cache/<xx>/<yy>/<md5>.<ext>.
+SORL_NAME = re.compile(r'^[0-9a-f]{32}\.[a-z]+$')
+
+
+class MediaCollector:
+    """
+    Находит и удаляет файлы, на которые не ссылается ни один пост.
+
+    Файлы моложе min_age секунд не трогаются: их могли только что
+    записать для поста, строка которого ещё не зафиксирована. Перед
+    удалением число ссылок на картинку проверяется ещё раз.
+    """
+
+    def __init__(self, batch_size=1000, min_age=24 * 60 * 60,
+                 dry_run=False, limit=None, checkpoint=None,
+                 report=None):
+        self.storage = Post._meta.get_field('image').storage
+        self.batch_size = batch_size
+        self.min_age = min_age
+        self.deadline = time.time() - min_age
+        self.dry_run = dry_run
+        self.limit = limit
+        self.checkpoint_path = checkpoint
+        self.report = report or (lambda name, size: None)
+        self.checkpoint = self.load_checkpoint()
+        self.checked = self.orphans = self.freed = 0
+        self._digests = None
+        self._sorl_names = None
+        self.root_parts = set()
+
+    def get_roots(self):
+        """Корни обхода в порядке сортировки путей."""
+        images = Post._meta.get_field('image').upload_to.strip('/')
+        sorl = sorl_settings.THUMBNAIL_PREFIX.strip('/')
+        roots = [
+            (tuple(images.split('/')), self.is_image, self.collect_images),
+            (tuple(thumbnails.VARIANTS_DIR.split('/')), self.is_variants,
+             self.collect_variants),
+            (tuple(sorl.split('/')), self.is_sorl_thumbnail,
+             self.collect_sorl_thumbnails),
+        ]
+        return sorted(roots, key=lambda root: root[0])
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(
+                self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as file:
+            return tuple(json.load(file)['done'])
+
+    def save_checkpoint(self, parts):
+        if self.dry_run or not self.checkpoint_path:
+            return
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'done': list(parts)}, file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if (not self.dry_run and self.checkpoint_path
+                and os.path.exists(self.checkpoint_path)):
+            os.remove(self.checkpoint_path)
+
+    def is_behind(self, parts):
+        """Каталог и всё вложенное уже обработаны прошлым запуском."""
+        return (
+            self.checkpoint is not None and parts < self.checkpoint
+            and self.checkpoint[:len(parts)] != parts
+        )
+
+    def is_exhausted(self):
+        return self.limit is not None and self.checked >= self.limit
+
+    def collect(self):
+        """
+        Обходит все корни. Возвращает True, если обход закончен,
+        и False, если он прерван по лимиту и будет продолжен.
+        """
+        roots = self.get_roots()
+        self.root_parts = {parts for parts, _, _ in roots}
+        for parts, is_item, process in roots:
+            if self.is_behind(parts):
+                continue
+            if not self.visit(parts, is_item, process):
+                return False
+        self.clear_checkpoint()
+        return True
+
+    def visit(self, parts, is_item, process):
+        """
+        Обрабатывает записи каталога parts пачками, затем вложенные
+        каталоги. Каталог целиком в память не читается: запоминаются
+        только имена вложенных каталогов.
+        """
+        path = default_storage.path('/'.join(parts))
+        if not os.path.isdir(path):
+            return True
+        done = self.checkpoint is not None and parts <= self.checkpoint
+        subdirs = []
+        for batch in self.scan(path, is_item, subdirs):
+            if not done:
+                process(parts, batch)
+        if not done:
+            self.save_checkpoint(parts)
+        if self.is_exhausted():
+            return False
+        for name in sorted(subdirs):
+            child = parts + (name,)
+            # Вложенный корень, например cache/variants внутри каталога
+            # миниатюр sorl, обходится отдельно со своей проверкой.
+            if child in self.root_parts or self.is_behind(child):
+                continue
+            if not self.visit(child, is_item, process):
+                return False
+        return True
+
+    def scan(self, path, is_item, subdirs):
+        """
+        Выдаёт записи каталога path пачками по batch_size;
+        имена прочих вложенных каталогов складывает в subdirs.
+        """
+        batch = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if is_item(entry):
+                    batch.append(entry)
+                elif entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def is_old(self, entry):
+        return entry.stat(follow_symlinks=False).st_mtime < self.deadline
+
+    @staticmethod
+    def is_image(entry):
+        return entry.is_file(follow_symlinks=False)
+
+    def collect_images(self, parts, batch):
+        """Проверяет пачку файлов картинок и удаляет сирот."""
+        self.checked += len(batch)
+        names = {
+            '/'.join(parts + (entry.name,)): entry
+            for entry in batch if self.is_old(entry)
+        }
+        referenced = set(
+            Post.objects.filter(image__in=names)
+            .values_list('image', flat=True)
+        )
+        for name, entry in names.items():
+            if name in referenced:
+                continue
+            size = entry.stat(follow_symlinks=False).st_size
+            if entry.name.startswith(TEMP_PREFIX):
+                # Недописанная загрузка: в базу её имя не попадает.
+                if not self.dry_run:
+                    self.storage.delete(name)
+            elif not self.dry_run and not media.release_image(
+                    name, self.min_age):
+                continue
+            self.found(name, size)
+
+    @staticmethod
+    def is_variants(entry):
+        return (
+            entry.is_dir(follow_symlinks=False)
+            and bool(VARIANTS_NAME.match(entry.name))
+        )
+
+    def collect_variants(self, parts, batch):
+        """То же для каталогов вариантов cache/variants/aa/<md5>."""
+        self.checked += len(batch)
+        directories = {}
+        for entry in batch:
+            if self.is_old(entry):
+                directory = '/'.join(parts + (entry.name,))
+                directories[directory] = self.read_source(directory)
+        referenced = set(
+            Post.objects.filter(image__in=[
+                name for name in directories.values() if name
+            ]).values_list('image', flat=True)
+        )
+        for directory, name in directories.items():
+            if name in referenced or (
+                    name is None and self.has_references(directory)):
+                continue
+            size = self.delete_directory(directory, name)
+            self.found(directory + '/', size)
+
+    def read_source(self, directory):
+        path = f'{directory}/{thumbnails.SOURCE_FILE}'
+        if not default_storage.exists(path):
+            return None
+        with default_storage.open(path, 'rb') as file:
+            return file.read().decode()
+
+    def has_references(self, directory):
+        """
+        Проверка каталога без файла source (варианты, созданные
+        до его появления) по md5 всех имён картинок. Множество
+        хешей собирается один раз и только при необходимости.
+        """
+        if self._digests is None:
+            self._digests = {
+                thumbnails.get_digest(name)
+                for name in media.iter_image_names(self.batch_size)
+            }
+        return directory.rsplit('/', 1)[1] in self._digests
+
+    def delete_directory(self, directory, name):
+        """Удаляет каталог вариантов и возвращает его размер."""
+        path = default_storage.path(directory)
+        with os.scandir(path) as entries:
+            size = sum(
+                entry.stat(follow_symlinks=False).st_size
+                for entry in entries if entry.is_file(follow_symlinks=False)
+            )
+        if not self.dry_run:
+            if name:
+                # Вместе с манифестом в кеше.
+                thumbnails.delete_variants(name)
+            else:
+                thumbnails.delete_directory(directory)
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+        return size
+
+    @staticmethod
+    def is_sorl_thumbnail(entry):
+        return (
+            entry.is_file(follow_symlinks=False)
+            and bool(SORL_NAME.match(entry.name))
+        )
+
+    def collect_sorl_thumbnails(self, parts, batch):
+        """
+        То же для миниатюр sorl: миниатюра нужна, пока пост ссылается
+        на её исходник. Записи sorl в базе о ней убирает команда
+        thumbnail cleanup.
+        """
+        self.checked += len(batch)
+        for entry in batch:
+            name = '/'.join(parts + (entry.name,))
+            if not self.is_old(entry) or name in self.get_sorl_names():
+                continue
+            size = entry.stat(follow_symlinks=False).st_size
+            if not self.dry_run:
+                default_storage.delete(name)
+            self.found(name, size)
+
+    def get_sorl_names(self):
+        """
+        Имена миниатюр sorl, исходники которых ещё есть у постов,
+        по хранилищу ключей sorl. Собираются один раз и только при
+        необходимости.
+        """
+        if self._sorl_names is not None:
+            return self._sorl_names
+        sources = {}
+        for key in kvstore._find_keys(identity='thumbnails'):
+            source = kvstore._get(key)
+            if source is not None:
+                sources.setdefault(source.name, []).append(key)
+        names = list(sources)
+        self._sorl_names = set()
+        for start in range(0, len(names), self.batch_size):
+            referenced = Post.objects.filter(
+                image__in=names[start:start + self.batch_size]
+            ).values_list('image', flat=True)
+            for name in set(referenced):
+                for key in sources[name]:
+                    for thumbnail_key in kvstore._get(
+                            key, identity='thumbnails') or ():
+                        thumbnail = kvstore._get(thumbnail_key)
+                        if thumbnail is not None:
+                            self._sorl_names.add(thumbnail.name)
+        return self._sorl_names
+
+    def found(self, name, size):
+        self.orphans += 1
+        self.freed += size
+        self.report(name, size)
@@ -0,0 +1,104 @@
+"""
+Поддержка денормализованных счётчиков постов, подписок и комментариев.
+"""
+from django.db import connections, transaction
+from django.db.models import AutoField, F, Q
+from django.db.models.functions import Greatest
+
+from .caching import bump_author_version, forget_author_versions
+from .models import AuthorStats, Comment, Follow, Post, User, count_related
+
+AUTHOR_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def bulk_batch_size(model, batch_size):
+    """
+    Размер пачки bulk_create не больше, чем позволяет база:
+    Django 2.2 не урезает явно переданный batch_size сам,
+    и SQLite отказывает при превышении числа параметров.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, AutoField)
+    ]
+    ops = connections[model.objects.db].ops
+    return max(1, min(batch_size, ops.bulk_batch_size(fields, [])))
+
+
+def change_author_stats(author_id, **deltas):
+    """
+    Атомарно сдвигает счётчики автора, например posts_count=1.
+    Если строки счётчиков ещё нет, она создаётся пересчётом.
+    После фиксации транзакции сводка автора устаревает.
+    """
+    updated = AuthorStats.objects.filter(author_id=author_id).update(**{
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    })
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        reconcile_authors(User.objects.filter(pk=author_id))
+    transaction.on_commit(lambda: bump_author_version(author_id))
+
+
+def change_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0)
+    )
+
+
+def get_author_stats(author):
+    """Счётчики автора; недостающая строка создаётся по факту."""
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        reconcile_authors(User.objects.filter(pk=author.pk))
+        author.stats = AuthorStats.objects.get(author=author)
+        return author.stats
+
+
+def reconcile_authors(authors, batch_size=1000):
+    """
+    Пересчитывает счётчики авторов одним UPDATE с подзапросами
+    и возвращает число исправленных строк.
+    """
+    missing = authors.filter(stats__isnull=True).values_list('pk', flat=True)
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(author_id=pk) for pk in missing.iterator()],
+        batch_size=bulk_batch_size(AuthorStats, batch_size),
+        ignore_conflicts=True
+    )
+    stats = AuthorStats.objects.filter(author__in=authors).annotate(**{
+        'actual_' + name: count_related(model, field)
+        for name, (model, field) in AUTHOR_COUNTERS.items()
+    })
+    drifted = Q()
+    for name in AUTHOR_COUNTERS:
+        drifted |= ~Q(**{name: F('actual_' + name)})
+    drifted_ids = list(
+        stats.filter(drifted).values_list('author_id', flat=True)
+    )
+    for start in range(0, len(drifted_ids), batch_size):
+        AuthorStats.objects.filter(
+            author_id__in=drifted_ids[start:start + batch_size]
+        ).update(**{
+            name: count_related(model, field)
+            for name, (model, field) in AUTHOR_COUNTERS.items()
+        })
+    transaction.on_commit(lambda: forget_author_versions(drifted_ids))
+    return len(drifted_ids)
+
+
+def reconcile_comment_counts(posts, batch_size=1000):
+    drifted_ids = list(
+        posts.annotate(actual=count_related(Comment, 'post'))
+        .exclude(comment_count=F('actual'))
+        .values_list('pk', flat=True)
+    )
+    for start in range(0, len(drifted_ids), batch_size):
+        Post.objects.filter(
+            pk__in=drifted_ids[start:start + batch_size]
+        ).update(comment_count=count_related(Comment, 'post'))
+    return len(drifted_ids)
@@ -0,0 +1,114 @@
+"""
+Генераторы синтетических строк для seed_yatube.
+
+Модуль не импортирует Django: функции выполняются в дочерних
+процессах и возвращают простые кортежи с индексами вместо ключей.
+Каждая пачка получает собственный генератор случайных чисел
+из (seed, вид, номер пачки), поэтому результат не зависит
+от числа процессов.
+"""
+import math
+import random
+
+WORDS = (
+    'сегодня вчера город море горы дорога поезд самолёт кофе утро вечер '
+    'ночь солнце дождь снег ветер друзья семья работа проект код релиз '
+    'книга фильм музыка концерт выставка музей парк река мост улица '
+    'площадь рынок ужин завтрак прогулка отпуск фото кадр свет тень '
+    'небо облака лес поле дом окно кошка собака история мысль идея '
+    'вопрос ответ новости планы мечта путь встреча разговор время '
+    'очень просто наконец снова опять почти всегда иногда долго быстро '
+    'хороший новый старый красивый тихий шумный тёплый холодный яркий'
+).split()
+
+
+def chunk_bounds(total, size):
+    """Тройки (номер пачки, начало, длина), покрывающие range(total)."""
+    return [
+        (number, start, min(size, total - start))
+        for number, start in enumerate(range(0, total, size))
+    ]
+
+
+def make_random(seed, kind, number):
+    return random.Random(f'{seed}:{kind}:{number}')
+
+
+def power_law_index(rnd, size):
+    """
+    Индекс из range(size) с вероятностью примерно 1/(k+1):
+    первые индексы выпадают часто, хвост — редко.
+    """
+    return min(size - 1, int(size ** rnd.random()) - 1)
+
+
+def make_text(rnd, median_words, max_words):
+    """Текст логнормальной длины вокруг median_words слов."""
+    count = int(rnd.lognormvariate(math.log(median_words), 0.8))
+    words = rnd.choices(WORDS, k=max(1, min(count, max_words)))
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + '.'
+
+
+def post_time(index, total, begin, span):
+    """Посты равномерно распределены по времени в порядке индексов."""
+    return begin + span * index / total
+
+
+def post_rows(task):
+    """
+    Посты пачки: (текст, индекс автора, индекс сообщества или None,
+    время публикации). Частые авторы — первые пользователи.
+    """
+    seed, number, start, count, total, users, groups, begin, span = task
+    rnd = make_random(seed, 'post', number)
+    rows = []
+    for index in range(start, start + count):
+        group = None
+        if groups and rnd.random() < 0.6:
+            group = rnd.randrange(groups)
+        rows.append((
+            make_text(rnd, 40, 600),
+            power_law_index(rnd, users),
+            group,
+            post_time(index + rnd.random(), total, begin, span),
+        ))
+    return rows
+
+
+def comment_rows(task):
+    """
+    Комментарии пачки: (текст, индекс поста, индекс автора, время).
+    Больше всего комментариев у свежих постов, пишут их вскоре
+    после публикации.
+    """
+    seed, number, count, posts, users, begin, span = task
+    rnd = make_random(seed, 'comment', number)
+    rows = []
+    for _ in range(count):
+        post = posts - 1 - power_law_index(rnd, posts)
+        published = post_time(post + 1, posts, begin, span)
+        rows.append((
+            make_text(rnd, 12, 200),
+            post,
+            rnd.randrange(users),
+            published + (begin + span - published) * rnd.random() ** 3,
+        ))
+    return rows
+
+
+def follow_rows(task):
+    """
+    Подписки пачки: (индекс подписчика, индекс автора) без повторов
+    внутри пачки. Число подписчиков автора подчиняется степенному
+    закону, поэтому появляются авторы-знаменитости.
+    """
+    seed, number, count, users = task
+    rnd = make_random(seed, 'follow', number)
+    pairs = {}
+    for _ in range(count):
+        user = rnd.randrange(users)
+        author = power_law_index(rnd, users)
+        if user != author:
+            pairs[user, author] = None
+    return list(pairs)
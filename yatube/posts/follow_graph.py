@@ -0,0 +1,178 @@
+"""
+Граф подписок в общем кеше.
+
+Для каждого пользователя хранятся два отсортированных массива id:
+на кого он подписан и кто подписан на него. Массивы лежат в кеше
+байтами array('q') — по восемь байт на ребро — и видны всем
+процессам. Проверка подписки — двоичный поиск в массиве, список
+подписчиков для раскладки постов — сам массив; на горячем пути
+запросов к базе нет.
+
+Массивы не правятся на месте: чтение, правка и запись в кеш
+не атомарны, и одновременные подписки на одного автора теряли бы
+друг друга. Вместо этого у каждого массива есть версия, и массив
+хранится первым элементом с версией, прочитанной до запроса к базе.
+Сигналы Follow после фиксации транзакции увеличивают версии массивов
+обеих сторон, и массив с чужой версией перечитывается одним запросом
+по индексу подписок. Массив, собранный до фиксации, но записанный
+после неё, остаётся со старой версией и в ход не идёт. Команда
+rebuild_follow_graph перестраивает массивы всех пользователей.
+"""
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow, User
+
+FOLLOWING_KEY = 'follow_graph:following:{}'
+FOLLOWERS_KEY = 'follow_graph:followers:{}'
+VERSION_KEY = '{}:version'
+# Сторона графа: ключ массива, поле владельца и поле соседей в Follow.
+SIDES = (
+    (FOLLOWING_KEY, 'user_id', 'author_id'),
+    (FOLLOWERS_KEY, 'author_id', 'user_id'),
+)
+
+
+def decode(data):
+    ids = array('q')
+    ids.frombytes(data)
+    return ids
+
+
+def contains(ids, value):
+    position = bisect_left(ids, value)
+    return position < len(ids) and ids[position] == value
+
+
+def _new_version(key):
+    # Начинаем с метки времени, чтобы после вытеснения счётчика
+    # не вернуться к версии, с которой массив ещё лежит в кеше.
+    cache.add(VERSION_KEY.format(key), time.time_ns(),
+              timeout=settings.FOLLOW_GRAPH_TIMEOUT)
+    return cache.get(VERSION_KEY.format(key))
+
+
+def _get_versions(keys):
+    """Версии массивов keys; недостающие заводятся заново."""
+    values = cache.get_many([VERSION_KEY.format(key) for key in keys])
+    return {
+        key: values.get(VERSION_KEY.format(key)) or _new_version(key)
+        for key in keys
+    }
+
+
+def _store(values, versions):
+    cache.set_many(
+        {
+            key: (array('q', [versions[key]]) + ids).tobytes()
+            for key, ids in values.items()
+        },
+        timeout=settings.FOLLOW_GRAPH_TIMEOUT
+    )
+
+
+def _load(side, pk, version):
+    key, field, other = side
+    ids = array('q', (
+        Follow.objects.filter(**{field: pk}).order_by(other)
+        .values_list(other, flat=True)
+    ))
+    _store({key.format(pk): ids}, {key.format(pk): version})
+    return ids
+
+
+def keys(side, pk):
+    """Ключи массива pk и его версии — для общего get_many."""
+    return [side[0].format(pk), VERSION_KEY.format(side[0].format(pk))]
+
+
+def load(side, pk, values):
+    """Массив pk из значений, прочитанных get_many по keys()."""
+    key, version_key = keys(side, pk)
+    version = values.get(version_key) or _new_version(key)
+    data = values.get(key)
+    if data is not None:
+        ids = decode(data)
+        if ids[0] == version:
+            return ids[1:]
+    return _load(side, pk, version)
+
+
+def get_following(user_id):
+    """Отсортированные id авторов, на которых подписан user_id."""
+    return load(SIDES[0], user_id,
+                cache.get_many(keys(SIDES[0], user_id)))
+
+
+def get_followers(author_id):
+    """Отсортированные id подписчиков автора author_id."""
+    return load(SIDES[1], author_id,
+                cache.get_many(keys(SIDES[1], author_id)))
+
+
+def is_following(user_id, author_id):
+    return contains(get_following(user_id), author_id)
+
+
+def _bump_versions(keys):
+    for key in keys:
+        try:
+            cache.incr(VERSION_KEY.format(key))
+        except ValueError:
+            # Версии нет — нет и чтения, начатого до фиксации:
+            # следующее заведёт версию и увидит изменение.
+            pass
+
+
+def invalidate(user_id, author_id):
+    """
+    Делает устаревшими массивы, которые задела подписка user_id
+    на author_id: они перечитаются из базы при следующем чтении.
+    """
+    _bump_versions([
+        FOLLOWING_KEY.format(user_id), FOLLOWERS_KEY.format(author_id)
+    ])
+
+
+def forget(user_ids):
+    """Делает устаревшими массивы user_ids, например после bulk_create."""
+    _bump_versions([
+        key.format(pk) for pk in user_ids for key, _, _ in SIDES
+    ])
+
+
+def rebuild(batch_size=1000):
+    """
+    Записывает в кеш массивы всех пользователей, пачками по id,
+    включая пустые. Возвращает число пользователей.
+    """
+    users = User.objects.order_by('id').values_list('id', flat=True)
+    last = total = 0
+    while True:
+        user_ids = list(users.filter(id__gt=last)[:batch_size])
+        if not user_ids:
+            return total
+        # Версии читаются до запросов, как и при промахе.
+        versions = _get_versions([
+            key.format(pk) for pk in user_ids for key, _, _ in SIDES
+        ])
+        values = {}
+        for key, field, other in SIDES:
+            ids = {pk: array('q') for pk in user_ids}
+            # id пачки идут подряд: диапазон вместо IN по индексу.
+            rows = Follow.objects.filter(**{
+                f'{field}__gte': user_ids[0],
+                f'{field}__lte': user_ids[-1],
+            }).order_by(field, other).values_list(field, other)
+            for pk, other_id in rows.iterator():
+                ids[pk].append(other_id)
+            values.update({key.format(pk): row for pk, row in ids.items()})
+        _store(values, versions)
+        total += len(user_ids)
+        if len(user_ids) < batch_size:
+            return total
+        last = user_ids[-1]
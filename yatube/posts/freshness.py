@@ -0,0 +1,111 @@
+"""
+Условные GET-запросы к HTML-страницам.
+
+Для каждой страницы дешёвым запросом считается её свежесть — время
+последнего изменения того, что она показывает: последнего поста
+группы, последнего комментария к посту и т. п. Эта дата уходит
+в Last-Modified. Правки и удаления постов дат не сдвигают, поэтому
+в ETag кроме неё входят версии кеша (posts.caching), путь запроса
+и пользователь. Версию лент сдвигает и появление вариантов картинок
+(thumbnails.store_manifest), иначе страница с заглушкой
+перепроверялась бы как неизменная. Если клиент прислал совпадающий
+ETag, страница не строится и отдаётся 304. Браузеры и прокси
+присылают ETag вместе
+с If-Modified-Since, и тогда дата не сверяется (RFC 7232): она
+решает только для клиентов, которые знают лишь Last-Modified.
+
+Страницы анонимов кешируются публично на HTML_CACHE_MAX_AGE секунд
+с Vary: Cookie, страницы вошедших пользователей — только браузером
+и с обязательной перепроверкой.
+"""
+import datetime
+import functools
+import hashlib
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .caching import (FEED_VERSION_KEY, PROFILE_VERSION_KEY,
+                      get_request_versions)
+from .models import Post
+
+# Профиль автора показывает счётчики подписок и кнопку подписки.
+PROFILE_KEYS = (FEED_VERSION_KEY, PROFILE_VERSION_KEY)
+
+
+def group_posts(slug):
+    return (
+        Post.objects.filter(group__slug=slug)
+        .aggregate(date=Max('pub_date'))['date']
+    )
+
+
+def profile(username):
+    return (
+        Post.objects.filter(author__username=username)
+        .aggregate(date=Max('pub_date'))['date']
+    )
+
+
+def post_view(username, post_id):
+    dates = Post.objects.filter(pk=post_id).aggregate(
+        published=Max('pub_date'),
+        commented=Max('comments__created')
+    )
+    return max(filter(None, dates.values()), default=None)
+
+
+def get_state(request, get_date, keys, kwargs):
+    """Версии keys и дата свежести; считаются один раз за запрос."""
+    if not hasattr(request, '_page_state'):
+        versions, modified = get_request_versions(request, *keys)
+        date = get_date(**kwargs) if get_date else None
+        if date is None:
+            date = datetime.datetime.fromtimestamp(
+                modified, datetime.timezone.utc
+            )
+        request._page_state = versions, date
+    return request._page_state
+
+
+def set_cache_headers(request, response):
+    patch_vary_headers(response, ('Cookie',))
+    if request.user.is_authenticated or response.cookies:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True,
+                            max_age=settings.HTML_CACHE_MAX_AGE)
+
+
+def conditional_page(get_date=None, keys=(FEED_VERSION_KEY,)):
+    """
+    Декоратор представления: ETag, Last-Modified, 304 и заголовки
+    кеширования. get_date получает именованные аргументы
+    представления; без неё свежесть — время изменения версий keys.
+    """
+    def etag(request, *args, **kwargs):
+        versions, date = get_state(request, get_date, keys, kwargs)
+        raw = ':'.join([
+            request.get_full_path(), str(request.user.pk),
+            date.isoformat(), *map(str, versions)
+        ])
+        # Слабый: токен CSRF в форме меняется от запроса к запросу.
+        return 'W/"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+
+    def last_modified(request, *args, **kwargs):
+        return get_state(request, get_date, keys, kwargs)[1]
+
+    def decorator(view):
+        conditional = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            set_cache_headers(request, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.tags import link_posts
+
+
+class Command(BaseCommand):
+    help = 'Размечает хештеги и упоминания в уже опубликованных постах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько постов размечать за раз'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = Post.objects.order_by('id').only('id', 'text')
+        last = total = 0
+        while True:
+            batch = list(posts.filter(id__gt=last)[:batch_size])
+            link_posts(batch)
+            total += len(batch)
+            if len(batch) < batch_size:
+                break
+            last = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(
+            f'Размечено постов: {total}'
+        ))
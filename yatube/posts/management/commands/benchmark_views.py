@@ -0,0 +1,89 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts.benchmark import compare, run_benchmark
+from posts.models import Post
+from posts.seeding import DEFAULT_VOLUMES, seed_database
+
+# Замер сбрасывает кеш между повторами: общий кеш из YATUBE_CACHE_URL
+# подменяется локальным, чтобы не стереть данные других процессов.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число запросов, p50/p95 и пик памяти представлений '
+        'posts на отдельной тестовой базе и пишет отчёт в JSON'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Не сбрасывать кеш между повторами'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Не удалять тестовую базу и не заполнять её повторно'
+        )
+        parser.add_argument('--output', help='Файл для отчёта JSON')
+        parser.add_argument(
+            '--compare',
+            help='Отчёт другого коммита; регрессии завершают команду ошибкой'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Допустимый рост p95, доля (по умолчанию 0.2)'
+        )
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        # Как в боевом режиме: без DEBUG и панели отладки.
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, keepdb=options['keepdb']
+        )
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                if not Post.objects.exists():
+                    seed_database(volumes, seed=options['seed'])
+                report = run_benchmark(
+                    options['repeat'], options['warm_cache'], volumes
+                )
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content + '\n')
+        self.stdout.write(content)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                regressions = compare(
+                    json.load(file), report, options['tolerance']
+                )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,69 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.collector import MediaCollector
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки и варианты, на которые не ссылается ни один '
+        'пост. Обход можно прервать и продолжить с места остановки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать сирот, ничего не удаляя'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько файлов сверять с базой одним запросом'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=24,
+            help='Не трогать файлы моложе стольких часов'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Остановиться после стольких файлов (по границе каталога)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, '.collect_media.json'),
+            help='Файл контрольной точки для продолжения обхода'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать обход заново, забыв контрольную точку'
+        )
+
+    def handle(self, *args, **options):
+        if options['restart'] and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+        collector = MediaCollector(
+            batch_size=options['batch_size'],
+            min_age=options['min_age'] * 60 * 60,
+            dry_run=options['dry_run'],
+            limit=options['limit'],
+            checkpoint=options['checkpoint'],
+            report=lambda name, size: self.stdout.write(f'{name}\t{size}')
+        )
+        finished = collector.collect()
+        verb = 'найдено' if options['dry_run'] else 'удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено: {collector.checked}, {verb} сирот: '
+            f'{collector.orphans} ({collector.freed} байт)'
+        ))
+        if not finished:
+            self.stdout.write(
+                'Обход прерван по --limit, следующий запуск продолжит его'
+            )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «Возможно, вы знакомы»'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=None,
+            help='Сколько рекомендаций хранить на пользователя'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Скольких пользователей записывать за раз'
+        )
+        parser.add_argument(
+            '--max-group-size',
+            type=int,
+            default=1000,
+            help='Группы с большим числом авторов не учитываются'
+        )
+
+    def handle(self, *args, **options):
+        total = recommendations.compute(
+            top=options['top'],
+            batch_size=options['batch_size'],
+            max_group_size=options['max_group_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей с рекомендациями: {total}'
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.paginators import FORWARD, CursorPaginator
+from posts.models import Comment, Follow, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает планы выполнения запросов лент на текущих данных. '
+        'Для сравнения запустите до и после миграции 0007_feed_indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-page', type=int, default=10)
+
+    def handle(self, *args, **options):
+        per_page = options['per_page']
+        newest = Post.objects.order_by('-pub_date', '-id').first()
+        oldest = Post.objects.order_by('pub_date', 'id').first()
+        follow = Follow.objects.order_by('pk').first()
+        if newest is None or follow is None:
+            raise CommandError(
+                'Нет данных: сначала заполните базу командой seed_yatube'
+            )
+        grouped = Post.objects.filter(group__isnull=False).first()
+        deep = [oldest.pub_date, oldest.pk]
+
+        def feed(queryset, values=None):
+            paginator = CursorPaginator(queryset.for_feed(), per_page)
+            return paginator.page_queryset(FORWARD, values)
+
+        queries = {
+            'index: первая страница': feed(Post.objects),
+            'index: глубокая страница': feed(Post.objects, deep),
+            'profile: лента автора': feed(
+                Post.objects.filter(author_id=newest.author_id)
+            ),
+            'follow_index: сборка ленты': Post.objects.filter(
+                author__following__user_id=follow.user_id
+            ).order_by('-pub_date', '-id').values_list('pk')[:800],
+            'profile: проверка подписки': Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id
+            ),
+            'fan-out: подписчики автора': Follow.objects.filter(
+                author_id=follow.author_id
+            ).values_list('user_id', flat=True),
+            'post_view: комментарии': Comment.objects.filter(
+                post_id=newest.pk
+            ).order_by('path')[:per_page],
+        }
+        if grouped is not None:
+            queries['group_posts: лента сообщества'] = feed(
+                Post.objects.filter(group_id=grouped.group_id)
+            )
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
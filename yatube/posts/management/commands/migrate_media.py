@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов со старыми именами в хранилище '
+        'по содержимому: одинаковые файлы сливаются в один'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет перенесено'
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = (
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by('image').values_list('image', flat=True).distinct()
+        )
+        moved = missing = 0
+        # Список целиком: по ходу переноса строки таблицы меняются.
+        for name in list(names):
+            if storage.is_digest_name(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            if options['dry_run']:
+                self.stdout.write(name)
+                moved += 1
+                continue
+            with storage.open(name) as file:
+                new_name = storage.save(name, file)
+            Post.objects.filter(image=name).update(
+                image=new_name, image_variants=''
+            )
+            # Старый файл больше не нужен ни одному посту, а загрузки
+            # его не переиспользуют: имя не по содержимому.
+            media.release_image(name, min_age=0)
+            moved += 1
+            self.stdout.write(f'{name} → {new_name}')
+        if options['dry_run']:
+            self.stdout.write(f'К переносу: {moved}, без файла: {missing}')
+            return
+        after = Post.objects.exclude(image='').exclude(image__isnull=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено: {moved}, без файла: {missing}, '
+            f'уникальных файлов: {after.values("image").distinct().count()}'
+        ))
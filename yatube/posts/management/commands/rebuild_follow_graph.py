@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import follow_graph
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает граф подписок в кеше из таблицы Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Скольких пользователей записывать за раз'
+        )
+
+    def handle(self, *args, **options):
+        total = follow_graph.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перестроено пользователей: {total}'
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from posts import media, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново заполняет манифесты вариантов в строках постов '
+        'по файлам manifest.json на диске'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько имён картинок читать одним запросом'
+        )
+        parser.add_argument(
+            '--render',
+            action='store_true',
+            help='Готовить варианты картинок, для которых их нет на диске'
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        stored = missing = 0
+        for name in media.iter_image_names(options['batch_size']):
+            manifest = thumbnails.read_manifest(name)
+            if manifest is None and options['render']:
+                if not storage.exists(name):
+                    self.stderr.write(f'Нет файла: {name}')
+                    continue
+                manifest = thumbnails.render_variants(Post(image=name).image)
+            if manifest is None:
+                # Варианты готовятся при первом показе картинки.
+                Post.objects.filter(image=name).update(image_variants='')
+                missing += 1
+                continue
+            stored += thumbnails.store_manifest(name, manifest)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {stored}, картинок без вариантов: {missing}'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_authors, reconcile_comment_counts
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с данными и чинит расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк обновлять одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        authors = reconcile_authors(User.objects.all(), batch_size)
+        posts = reconcile_comment_counts(Post.objects.all(), batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: авторов — {authors}, постов — {posts}'
+        ))
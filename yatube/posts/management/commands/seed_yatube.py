@@ -0,0 +1,87 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.models import User
+from posts.seeding import DEFAULT_END, DEFAULT_VOLUMES, seed_database
+
+
+def parse_date(value):
+    date = datetime.datetime.strptime(value, '%Y-%m-%d')
+    return date.replace(tzinfo=timezone.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, сообществами, '
+        'постами, комментариями и подписками для нагрузочных замеров'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Одинаковый seed даёт одинаковые данные'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Сколько процессов генерируют строки'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределить посты'
+        )
+        parser.add_argument(
+            '--end',
+            type=parse_date,
+            default=DEFAULT_END,
+            help='Дата ГГГГ-ММ-ДД, к которой заканчиваются посты; '
+                 'по умолчанию постоянная, чтобы данные не зависели '
+                 'от дня запуска'
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Префикс имён пользователей и адресов сообществ'
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом «{prefix}» уже есть, '
+                f'укажите другой --prefix'
+            )
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        started = time.monotonic()
+
+        def log(kind, done):
+            if self.verbosity > 1:
+                self.stdout.write(f'{kind}: {done}')
+
+        self.verbosity = options['verbosity']
+        created = seed_database(
+            volumes,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            prefix=prefix,
+            processes=options['processes'],
+            days=options['days'],
+            end=options['end'],
+            log=log
+        )
+        summary = ', '.join(f'{kind} — {count}' for kind, count
+                            in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {summary} за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,75 @@
+"""
+Учёт ссылок на файлы картинок.
+
+Картинки лежат в ContentAddressedStorage, и один файл может быть
+у нескольких постов. Счётчиком ссылок служит сам столбец
+Post.image (по нему есть индекс): файл и его варианты удаляются,
+когда на него больше не ссылается ни один пост и его давно
+не записывали.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+
+from . import thumbnails
+from .models import Post
+
+
+def iter_image_names(batch_size=1000):
+    """
+    Имена картинок постов по порядку без повторов. Читаются
+    пачками по индексу post_image_idx, а не одним списком.
+    """
+    names = (
+        Post.objects.exclude(image='').exclude(image__isnull=True)
+        .order_by('image').values_list('image', flat=True).distinct()
+    )
+    last = None
+    while True:
+        batch = names if last is None else names.filter(image__gt=last)
+        batch = list(batch[:batch_size])
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+
+
+def count_references(name):
+    return Post.objects.filter(image=name).count()
+
+
+def is_recent(storage, name, min_age):
+    try:
+        modified = os.path.getmtime(storage.path(name))
+    except FileNotFoundError:
+        return False
+    return modified > time.time() - min_age
+
+
+def release_image(name, min_age=None):
+    """
+    Удаляет файл name и его варианты, если он больше не нужен.
+    Возвращает True, если файл удалён.
+
+    Одинаковая загрузка переиспользует файл раньше, чем появится
+    строка её поста, поэтому файл, записанный или переиспользованный
+    за последние min_age секунд (по умолчанию MEDIA_RELEASE_MIN_AGE),
+    не удаляется, даже если ссылок на него нет: его позже уберёт
+    collect_media.
+    """
+    if min_age is None:
+        min_age = settings.MEDIA_RELEASE_MIN_AGE
+    if not name or count_references(name):
+        return False
+    storage = Post._meta.get_field('image').storage
+    try:
+        if is_recent(storage, name, min_age):
+            return False
+        storage.delete(name)
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT: такой файл хранилищу не принадлежит.
+        return False
+    thumbnails.delete_variants(name)
+    return True
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, help_text='Манифест вариантов картинки в JSON', verbose_name='Варианты картинки'),
+        ),
+    ]
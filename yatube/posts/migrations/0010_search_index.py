@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# Обратный индекс полнотекстового поиска (posts.search.SQLiteBackend).
+# В столбцах хранятся основы слов, поэтому токенизатору остаётся только
+# разбить текст на слова. Заполняется командой rebuild_search_index.
+CREATE_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search '
+    'USING fts5(text, comments, grp, author, '
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+DROP_SQL = 'DROP TABLE IF EXISTS posts_search'
+
+
+def create_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_SQL)
+
+
+def drop_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_table, drop_table),
+    ]
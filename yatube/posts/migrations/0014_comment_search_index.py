@@ -0,0 +1,77 @@
+from django.db import migrations
+
+from posts.stemmer import stem_text
+
+# Комментарии переезжают из столбца comments документа поста в свою
+# таблицу: строка на комментарий, rowid равен id комментария. Основы
+# слов постов переносятся как есть, комментарии индексируются заново.
+CREATE_POSTS_SQL = (
+    'CREATE VIRTUAL TABLE posts_search USING fts5(text, grp, author, '
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+CREATE_OLD_POSTS_SQL = (
+    'CREATE VIRTUAL TABLE posts_search '
+    'USING fts5(text, comments, grp, author, '
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+CREATE_COMMENTS_SQL = (
+    'CREATE VIRTUAL TABLE posts_search_comments '
+    'USING fts5(comments, post_id UNINDEXED, '
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+BATCH_SIZE = 1000
+
+
+def split_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('ALTER TABLE posts_search RENAME TO posts_search_old')
+    schema_editor.execute(CREATE_POSTS_SQL)
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, grp, author) '
+        'SELECT rowid, text, grp, author FROM posts_search_old'
+    )
+    schema_editor.execute('DROP TABLE posts_search_old')
+    schema_editor.execute(CREATE_COMMENTS_SQL)
+    comments = apps.get_model('posts', 'Comment').objects.values_list(
+        'id', 'text', 'post_id'
+    ).order_by('id')
+    rows = []
+    with schema_editor.connection.cursor() as cursor:
+        for pk, text, post_id in comments.iterator(chunk_size=BATCH_SIZE):
+            rows.append((pk, ' '.join(stem_text(text)), post_id))
+            if len(rows) == BATCH_SIZE:
+                cursor.executemany(
+                    'INSERT INTO posts_search_comments '
+                    '(rowid, comments, post_id) VALUES (%s, %s, %s)', rows
+                )
+                rows = []
+        cursor.executemany(
+            'INSERT INTO posts_search_comments '
+            '(rowid, comments, post_id) VALUES (%s, %s, %s)', rows
+        )
+
+
+def merge_tables(apps, schema_editor):
+    # Столбец comments остаётся пустым до rebuild_search_index.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_search_comments')
+    schema_editor.execute('ALTER TABLE posts_search RENAME TO posts_search_old')
+    schema_editor.execute(CREATE_OLD_POSTS_SQL)
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, comments, grp, author) '
+        "SELECT rowid, text, '', grp, author FROM posts_search_old"
+    )
+    schema_editor.execute('DROP TABLE posts_search_old')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_recommendations'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_table, merge_tables),
+    ]
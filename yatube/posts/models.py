@@ -1,9 +1,31 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, LPad
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
 
+def count_related(model, field):
+    """
+    Коррелированный подзапрос с числом строк model, ссылающихся
+    через field на текущую запись. В отличие от Count() по JOIN
+    вычисляется только для выбранных строк.
+    """
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(
+        Subquery(
+            rows.values(field).annotate(count=Count('pk')).values('count'),
+            output_field=models.IntegerField()
+        ),
+        0
+    )
+
+
 class Group(models.Model):
     title = models.CharField('Имя Сообщества', max_length=200)
     slug = models.SlugField(unique=True)
@@ -17,7 +39,18 @@ class Group(models.Model):
         return f'{self.title}'
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Посты для лент: автор и сообщество приходят тем же запросом,
+        число комментариев хранится в самом посте.
+        """
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
+    DERIVED_FIELDS = ('comment_count', 'image_variants')
+
     text = models.TextField(
         'Текст Поста',
         help_text='*Поле обязательно для заполнения'
@@ -27,7 +60,8 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -35,55 +69,354 @@ class Post(models.Model):
         null=True,
         on_delete=models.SET_NULL,
         related_name='posts',
-        verbose_name='Сообщество'
+        verbose_name='Сообщество',
+        db_index=False
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True
     )
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='Манифест вариантов картинки в JSON'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+            # Число постов с данным файлом — счётчик ссылок на него.
+            models.Index(fields=('image',), name='post_image_idx'),
+        )
 
     def __str__(self) -> str:
         return f'{self.text[:15]}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Файл при загрузке: после замены картинки старый освобождается.
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
+    @property
+    def variants(self):
+        """Манифест вариантов картинки или None, если их ещё нет."""
+        if not self.image_variants:
+            return None
+        return json.loads(self.image_variants)
+
+    def save(self, *args, **kwargs):
+        # Счётчик и манифест вариантов меняются только UPDATE-ами:
+        # сохранение формы со старыми значениями в памяти не должно
+        # их затирать. Манифест сбрасывается, если сменилась картинка.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DERIVED_FIELDS
+            ]
+            loaded = getattr(self, '_loaded_image', self.image.name)
+            if self.image.name != loaded:
+                self.image_variants = ''
+                fields.append('image_variants')
+            kwargs['update_fields'] = fields
+        super().save(*args, **kwargs)
+
+
+# Материализованный путь комментария — id всех предков и его
+# собственный, по PATH_STEP цифр с ведущими нулями. Сортировка
+# по пути даёт ветку в порядке обхода в глубину.
+PATH_STEP = 10
+COMMENT_MAX_DEPTH = 24
+PATH_MAX_LENGTH = PATH_STEP * (COMMENT_MAX_DEPTH + 1)
+
+
+def root_path():
+    """Путь комментария верхнего уровня выражением по его id."""
+    return LPad(Cast('id', models.CharField()), PATH_STEP, Value('0'))
+
+
+class CommentQuerySet(models.QuerySet):
+    def thread(self, post_id):
+        """Все комментарии поста в порядке ветки, с авторами."""
+        return (
+            self.filter(post_id=post_id).select_related('author')
+            .order_by('path')
+        )
+
+    def subtree(self, comment, depth=None):
+        """
+        Ответы на comment на любую или не более чем depth уровней
+        вглубь. Диапазон по пути обслуживается индексом
+        (post, path), в отличие от LIKE 'путь%'. Границы диапазона
+        состоят из цифр, как и сами пути, поэтому он верен при любом
+        правиле сравнения строк (collation) базы.
+        """
+        replies = self.thread(comment.post_id).filter(
+            path__gte=comment.path + '0' * PATH_STEP,
+            path__lte=comment.path.ljust(PATH_MAX_LENGTH, '9')
+        )
+        if depth is not None:
+            replies = replies.filter(depth__lte=comment.depth + depth)
+        return replies
+
+    def with_has_replies(self):
+        """Отмечает комментарии, на которые есть ответы."""
+        return self.annotate(has_replies=Exists(
+            self.model.objects.filter(parent=OuterRef('pk'))
+        ))
+
+    def fill_root_paths(self):
+        """Пути для комментариев верхнего уровня, вставленных bulk_create."""
+        return self.filter(path='', parent__isnull=True).update(
+            path=root_path(), depth=0
+        )
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        blank=True,
+        null=True,
+        verbose_name='Ответ на'
+    )
     text = models.TextField()
     created = models.DateTimeField('Дата Публикации', auto_now_add=True)
+    path = models.CharField(
+        'Путь в ветке',
+        max_length=PATH_MAX_LENGTH,
+        blank=True,
+        editable=False
+    )
+    depth = models.PositiveSmallIntegerField(
+        'Глубина',
+        default=0,
+        editable=False
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('post', 'path'),
+                name='comment_post_path_idx'
+            ),
+        )
+
+    def save(self, *args, **kwargs):
+        # Ответы глубже COMMENT_MAX_DEPTH продолжают ветку
+        # на последнем уровне.
+        if self.parent is not None and (
+                self.parent.depth >= COMMENT_MAX_DEPTH):
+            self.parent = self.parent.parent
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding and not self.path:
+            # Путь включает собственный id, известный только после
+            # вставки.
+            prefix = self.parent.path if self.parent else ''
+            self.path = f'{prefix}{self.pk:0{PATH_STEP}d}'
+            self.depth = len(self.path) // PATH_STEP - 1
+            Comment.objects.filter(pk=self.pk).update(
+                path=self.path, depth=self.depth
+            )
 
 
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='follower'
+        related_name='follower',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='following',
+        db_index=False
     )
 
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx'
+            ),
+        )
+
+
+class AuthorStats(models.Model):
+    """
+    Денормализованные счётчики автора. Меняются атомарными
+    F()-обновлениями при записи, сверяются командой reconcile_counters.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        db_index=True
+    )
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self) -> str:
+        return f'{self.author}'
+
+
+class Tag(models.Model):
+    name = models.CharField('Тег', max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self) -> str:
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Хештег #name в тексте поста; заполняется при сохранении."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tag_links',
+        db_index=False
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_links',
+        db_index=False
+    )
+
+    class Meta:
+        verbose_name = 'Тег поста'
+        verbose_name_plural = 'Теги постов'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('tag', 'post'),
+                name='unique_post_tag'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('post',), name='post_tag_post_idx'),
+        )
+
+
+class Mention(models.Model):
+    """Упоминание @username в тексте поста; заполняется при сохранении."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        db_index=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        db_index=False
+    )
+
+    class Meta:
+        verbose_name = 'Упоминание'
+        verbose_name_plural = 'Упоминания'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_mention'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('post',), name='mention_post_idx'),
+        )
+
+
+class Recommendation(models.Model):
+    """
+    Автор, которого стоит предложить пользователю. Строки целиком
+    пересчитываются командой compute_recommendations.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        db_index=False
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommended_to'
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'rank'),
+                name='unique_recommendation_rank'
+            ),
+        )
@@ -0,0 +1,200 @@
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import models
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+# Границы целых, которые примет любая база (BIGINT).
+MIN_INTEGER = -2 ** 63
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничная навигация по ключу сортировки (keyset).
+
+    Следующая страница выбирается условием «строго после последней записи»
+    по полям ordering, поэтому не нужны ни OFFSET, ни COUNT(*): любая
+    страница стоит столько же, сколько первая, а новые записи не сдвигают
+    уже открытую ленту. Последнее поле ordering должно быть уникальным.
+
+    Один экземпляр отдаёт одну страницу: get_page() возвращает обычный
+    Page, а курсоры соседних страниц сохраняет в next_cursor
+    и previous_cursor. Курсор самой страницы в каноническом виде
+    лежит в cursor; None — первая страница, в том числе вместо
+    испорченного курсора.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 approximate_count=False):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+        self.approximate_count = approximate_count
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        self.cursor = None
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def get_page(self, cursor=None):
+        try:
+            direction, values = self.decode_cursor(cursor)
+        except InvalidCursor:
+            direction, values = FORWARD, None
+        else:
+            self.cursor = self.encode_values(direction, values)
+        rows = list(self.page_queryset(direction, values))
+        if direction == BACKWARD:
+            return self._build_page(
+                rows[:self.per_page][::-1],
+                has_next=True,
+                has_previous=len(rows) > self.per_page,
+            )
+        return self._build_page(
+            rows[:self.per_page],
+            has_next=len(rows) > self.per_page,
+            has_previous=values is not None,
+        )
+
+    def page_queryset(self, direction=FORWARD, values=None):
+        """
+        Запрос одной страницы: per_page + 1 строка после курсора,
+        лишняя строка показывает, есть ли страница дальше.
+        """
+        queryset = self.object_list
+        if direction == BACKWARD:
+            queryset = queryset.reverse()
+        if values is not None:
+            queryset = queryset.filter(
+                self._seek(values, reverse=direction == BACKWARD)
+            )
+        return queryset[:self.per_page + 1]
+
+    def _build_page(self, object_list, has_next, has_previous):
+        if object_list and has_next:
+            self.next_cursor = self.encode_cursor(FORWARD, object_list[-1])
+        if object_list and has_previous:
+            self.previous_cursor = self.encode_cursor(
+                BACKWARD, object_list[0]
+            )
+        number = 2 if self.previous_cursor else 1
+        self.num_pages = number + 1 if self.next_cursor else number
+        return Page(object_list, number, self)
+
+    def _seek(self, values, reverse):
+        """
+        Условие «после курсора» для составного ключа сортировки.
+        Отдельная граница по первому полю позволяет базе начать
+        просмотр индекса сразу с позиции курсора.
+        """
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        name, descending = self.fields[0]
+        bound = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{name}__{bound}': values[0]}) & condition
+
+    def encode_cursor(self, direction, obj):
+        return self.encode_values(
+            direction, [getattr(obj, name) for name, _ in self.fields]
+        )
+
+    def encode_values(self, direction, values):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            raise InvalidCursor
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+        except (TypeError, ValueError):
+            raise InvalidCursor
+        if direction not in (FORWARD, BACKWARD):
+            raise InvalidCursor
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor
+        opts = self.object_list.model._meta
+        try:
+            values = [
+                self.cursor_value(opts.get_field(name), value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            raise InvalidCursor
+        if None in values:
+            raise InvalidCursor
+        return direction, values
+
+    @staticmethod
+    def cursor_value(field, value):
+        """
+        Значение поля из курсора: целые — только int в пределах BIGINT,
+        остальное (даты, строки) — только строкой.
+        """
+        if isinstance(field, (models.AutoField, models.IntegerField)):
+            if type(value) is not int or not (
+                    MIN_INTEGER <= value <= MAX_INTEGER):
+                raise InvalidCursor
+        elif not isinstance(value, str):
+            raise InvalidCursor
+        return field.to_python(value)
+
+    @cached_property
+    def count(self):
+        """
+        Число записей. В режиме approximate_count результат COUNT(*)
+        кешируется на PAGINATOR_COUNT_TIMEOUT секунд и может отставать.
+        """
+        if not self.approximate_count:
+            return super().count
+        try:
+            sql = str(self.object_list.query)
+        except EmptyResultSet:
+            return 0
+        key = 'paginator_count:' + hashlib.md5(sql.encode()).hexdigest()
+        return cache.get_or_set(
+            key,
+            self.object_list.count,
+            timeout=settings.PAGINATOR_COUNT_TIMEOUT
+        )
+
+
+def paginate(request, object_list, per_page=None, **kwargs):
+    """
+    Возвращает страницу ленты по курсору из ?cursor=.
+    Старые ссылки вида ?page=N по-прежнему обслуживаются
+    обычным Paginator.
+    """
+    per_page = per_page or settings.POSTS_PER_PAGE
+    if 'page' in request.GET and 'cursor' not in request.GET:
+        return Paginator(object_list, per_page).get_page(
+            request.GET.get('page')
+        )
+    kwargs.setdefault(
+        'approximate_count', settings.PAGINATOR_APPROXIMATE_COUNT
+    )
+    paginator = CursorPaginator(object_list, per_page, **kwargs)
+    return paginator.get_page(request.GET.get('cursor'))
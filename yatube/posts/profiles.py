@@ -0,0 +1,96 @@
+"""
+Сводка автора для карточки профиля на страницах профиля и поста.
+
+Сводка — автор с именем и счётчиками (AuthorStats) — одна на автора
+и кешируется вместе с версией этого автора (posts.caching). Версию
+после фиксации поднимают сдвиг его счётчиков и смена имени, поэтому
+сводка устаревает сразу, а посты и подписки других авторов её
+не трогают. Подписан ли на автора текущий пользователь, видно
+по массиву его подписок из posts.follow_graph; сводка и массив
+читаются одним get_many, версия — вторым обращением к кешу. При
+попадании в кеш карточка не стоит ни одного запроса к базе.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+
+from . import follow_graph
+from .caching import bump_author_version, get_author_version
+from .counters import get_author_stats
+from .models import User
+
+SUMMARY_KEY = 'profile_summary:{}'
+# В кеш попадают только поля, которые показывает карточка.
+SUMMARY_FIELDS = ('username', 'first_name', 'last_name', 'stats')
+
+
+class ProfileSummary:
+    """Автор со счётчиками и отношение к нему текущего пользователя."""
+
+    def __init__(self, author, following):
+        self.author = author
+        self.following = following
+
+    @property
+    def display_name(self):
+        return self.author.get_full_name() or self.author.username
+
+    @property
+    def posts_count(self):
+        return self.author.stats.posts_count
+
+    @property
+    def followers_count(self):
+        return self.author.stats.followers_count
+
+    @property
+    def following_count(self):
+        return self.author.stats.following_count
+
+
+def load_author(username):
+    author = get_object_or_404(
+        User.objects.select_related('stats').only(*SUMMARY_FIELDS),
+        username=username
+    )
+    get_author_stats(author)
+    return author
+
+
+def get_profile_summary(request, username):
+    """Сводка автора username для request.user; 404, если автора нет."""
+    summary_key = SUMMARY_KEY.format(username)
+    viewer = request.user.pk if request.user.is_authenticated else None
+    following_side = follow_graph.SIDES[0]
+    keys = [summary_key]
+    if viewer:
+        keys += follow_graph.keys(following_side, viewer)
+    values = cache.get_many(keys)
+    cached_version, author = values.get(summary_key, (None, None))
+    version = author and get_author_version(author.pk)
+    if author is None or version != cached_version:
+        # Версия известного автора прочитана до запроса к базе: если
+        # его счётчики сдвинутся позже, сводка уйдёт в кеш под старой
+        # версией и будет перечитана. После переименования сводка под
+        # старым именем устаревает вместе с версией, и здесь будет 404.
+        known_pk = author and author.pk
+        author = load_author(username)
+        if author.pk != known_pk:
+            version = get_author_version(author.pk)
+        cache.set(summary_key, (version, author),
+                  timeout=settings.PROFILE_SUMMARY_CACHE_TIMEOUT)
+    following = viewer is not None and follow_graph.contains(
+        follow_graph.load(following_side, viewer, values),
+        author.pk
+    )
+    return ProfileSummary(author, following)
+
+
+def forget(author_id, username):
+    """
+    Сбрасывает сводку автора после смены имени или удаления: под
+    прежним именем она устаревает вместе с версией автора, под
+    username — удаляется, там мог остаться прежний владелец имени.
+    """
+    bump_author_version(author_id)
+    cache.delete(SUMMARY_KEY.format(username))
@@ -0,0 +1,150 @@
+"""
+Рекомендации «Возможно, вы знакомы».
+
+Кандидаты для пользователя — авторы, на которых подписаны его
+подписки (друзья друзей), и авторы, которые пишут в те же группы,
+что и он. Каждый путь через подписку добавляет к оценке кандидата
+единицу, каждая общая группа — GROUP_WEIGHT. Группы больше
+max_group_size пропускаются: соседство в них ничего не говорит.
+
+Расчёт — пакетная задача (команда compute_recommendations). Граф
+подписок и членство в группах читаются несколькими упорядоченными
+запросами values_list и хранятся в разреженных матрицах смежности
+(CSR) на массивах array, без объекта модели на каждое ребро.
+Лучшие кандидаты каждого пользователя записываются в Recommendation,
+и страницы читают их одним запросом по индексу (user, rank).
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .caching import bump_profile_version
+from .counters import bulk_batch_size
+from .models import Follow, Post, Recommendation, User
+
+GROUP_WEIGHT = 0.5
+READ_CHUNK_SIZE = 10000
+
+
+class Adjacency:
+    """
+    Разреженная матрица смежности в формате CSR. Строится из пар
+    (строка, столбец), отсортированных по строке: rows — id строк
+    по возрастанию, indices[indptr[i]:indptr[i + 1]] — столбцы
+    строки rows[i].
+    """
+
+    def __init__(self, pairs):
+        self.rows = array('q')
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        for row, column in pairs:
+            if not self.rows or self.rows[-1] != row:
+                if self.rows:
+                    self.indptr.append(len(self.indices))
+                self.rows.append(row)
+            self.indices.append(column)
+        if self.rows:
+            self.indptr.append(len(self.indices))
+        self.view = memoryview(self.indices)
+
+    def __getitem__(self, row):
+        """Столбцы строки row без копирования; пусто, если строки нет."""
+        position = bisect_left(self.rows, row)
+        if position == len(self.rows) or self.rows[position] != row:
+            return self.view[0:0]
+        return self.view[self.indptr[position]:self.indptr[position + 1]]
+
+
+def load_pairs(queryset, *fields):
+    return queryset.order_by(*fields).values_list(*fields).iterator(
+        chunk_size=READ_CHUNK_SIZE
+    )
+
+
+def load_graph():
+    """Подписки пользователей, группы авторов и участники групп."""
+    memberships = Post.objects.exclude(group=None).distinct()
+    return (
+        Adjacency(load_pairs(Follow.objects.all(), 'user_id', 'author_id')),
+        Adjacency(load_pairs(memberships, 'author_id', 'group_id')),
+        Adjacency(load_pairs(memberships, 'group_id', 'author_id')),
+    )
+
+
+def score_candidates(user_id, following, groups, members, max_group_size):
+    scores = defaultdict(float)
+    followed = following[user_id]
+    for friend in followed:
+        for candidate in following[friend]:
+            scores[candidate] += 1
+    for group in groups[user_id]:
+        group_members = members[group]
+        if len(group_members) > max_group_size:
+            continue
+        for candidate in group_members:
+            scores[candidate] += GROUP_WEIGHT
+    scores.pop(user_id, None)
+    for author in followed:
+        scores.pop(author, None)
+    return scores
+
+
+def top_candidates(scores, top):
+    """Лучшие top кандидатов; при равной оценке — с меньшим id."""
+    return heapq.nlargest(
+        top, scores.items(), key=lambda item: (item[1], -item[0])
+    )
+
+
+def compute(top=None, batch_size=1000, max_group_size=1000):
+    """
+    Пересчитывает рекомендации всех пользователей пачками по id.
+    Возвращает число пользователей, которым есть что предложить.
+    """
+    top = top or settings.RECOMMENDATIONS_PER_USER
+    following, groups, members = load_graph()
+    users = User.objects.order_by('id').values_list('id', flat=True)
+    last = total = 0
+    while True:
+        user_ids = list(users.filter(id__gt=last)[:batch_size])
+        rows = []
+        for user_id in user_ids:
+            best = top_candidates(score_candidates(
+                user_id, following, groups, members, max_group_size
+            ), top)
+            total += bool(best)
+            rows.extend(
+                Recommendation(user_id=user_id, author_id=author_id,
+                               rank=rank, score=score)
+                for rank, (author_id, score) in enumerate(best)
+            )
+        with transaction.atomic():
+            Recommendation.objects.filter(user_id__in=user_ids).delete()
+            Recommendation.objects.bulk_create(
+                rows, batch_size=bulk_batch_size(Recommendation, batch_size)
+            )
+        if len(user_ids) < batch_size:
+            break
+        last = user_ids[-1]
+    # Страницы с рекомендациями кешируются под версией профилей.
+    bump_profile_version()
+    return total
+
+
+def get_recommendations(user, limit=None):
+    """
+    Рекомендованные user авторы по убыванию оценки. Авторы,
+    на которых он подписался после расчёта, пропускаются.
+    """
+    authors = (
+        User.objects.filter(recommended_to__user=user)
+        .exclude(following__user=user)
+        .order_by('recommended_to__rank')
+        .only('username', 'first_name', 'last_name')
+    )
+    return list(authors[:limit or settings.RECOMMENDATIONS_SHOWN])
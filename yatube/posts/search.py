@@ -0,0 +1,318 @@
+"""
+Полнотекстовый поиск по постам.
+
+Документ поиска — пост: его текст, тексты комментариев, название
+группы и имя автора. Слова индексируются и ищутся в виде основ
+(см. posts.stemmer), поэтому «котам» находит пост про «котов».
+Индекс обновляется сигналами, а целиком перестраивается командой
+rebuild_search_index.
+
+Хранилище индекса подключается настройкой POST_SEARCH_BACKEND.
+SQLiteBackend держит обратный индекс в виртуальных таблицах FTS5
+и ранжирует результаты по BM25; DatabaseBackend обходится без
+индекса и годится для баз, где FTS5 нет.
+
+Комментарии индексируются отдельно от поста, по строке на
+комментарий: новый или удалённый комментарий меняет одну строку
+индекса, сколько бы их ни было у поста.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+from .stemmer import stem_text
+
+TABLE = 'posts_search'
+COMMENTS_TABLE = 'posts_search_comments'
+COLUMNS = ('text', 'grp', 'author')
+# Вес совпадения в каждом столбце поста и в комментарии для bm25().
+WEIGHTS = (1.0, 0.8, 0.8)
+COMMENTS_WEIGHT = 0.4
+
+
+def to_document(text):
+    return ' '.join(stem_text(text))
+
+
+def author_document(user):
+    """
+    Имя автора: слова и их основы. Стеммер рассчитан на обычные
+    слова и имена режет неровно («Иван» → «ива», «Ивану» → «иван»),
+    исходные слова позволяют найти автора по любой форме.
+    """
+    name = ' '.join((user.username, user.first_name, user.last_name))
+    words = name.lower().replace('ё', 'е').split()
+    return ' '.join(dict.fromkeys(words + stem_text(name)))
+
+
+class BaseBackend:
+    """Интерфейс хранилища поискового индекса."""
+
+    def index_posts(self, posts):
+        """Добавляет или заменяет документы постов posts."""
+
+    def remove_post(self, post_id):
+        """Удаляет документ поста из индекса."""
+
+    def index_comments(self, comments):
+        """Добавляет или заменяет комментарии comments."""
+
+    def remove_comment(self, comment_id):
+        """Удаляет комментарий из индекса."""
+
+    def update_group(self, group):
+        """Обновляет название группы в документах её постов."""
+
+    def update_posts_without_group(self):
+        """Убирает название группы из документов постов без группы."""
+
+    def update_author(self, user):
+        """Обновляет имя автора в документах его постов."""
+
+    def clear(self):
+        """Очищает индекс перед полной перестройкой."""
+
+    def search(self, query, offset, limit):
+        """id постов по убыванию релевантности."""
+        raise NotImplementedError
+
+    def count(self, query):
+        raise NotImplementedError
+
+
+class DatabaseBackend(BaseBackend):
+    """
+    Поиск без индекса: icontains по исходным полям, новые посты
+    выше. Основы слов здесь не используются.
+    """
+
+    def filter(self, query):
+        condition = Q()
+        for word in query.split():
+            condition &= (
+                Q(text__icontains=word)
+                | Q(comments__text__icontains=word)
+                | Q(group__title__icontains=word)
+                | Q(author__username__icontains=word)
+                | Q(author__first_name__icontains=word)
+                | Q(author__last_name__icontains=word)
+            )
+        return Post.objects.filter(condition).distinct()
+
+    def search(self, query, offset, limit):
+        return list(
+            self.filter(query).order_by('-pub_date', '-id')
+            .values_list('id', flat=True)[offset:offset + limit]
+        )
+
+    def count(self, query):
+        return self.filter(query).count()
+
+
+class SQLiteBackend(BaseBackend):
+    """
+    Обратный индекс в таблицах FTS5 (создаются миграциями):
+    в posts_search rowid строки равен id поста, в
+    posts_search_comments — id комментария, а id поста лежит
+    в неиндексируемом столбце post_id. В столбцах лежат основы
+    слов, а не исходный текст.
+    """
+
+    def execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.description:
+                return cursor.fetchall()
+        return None
+
+    def replace(self, table, columns, rows):
+        """Заменяет строки rows, первый элемент строки — rowid."""
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {table} WHERE rowid = %s',
+                [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, {", ".join(columns)}) '
+                f'VALUES (%s{", %s" * len(columns)})',
+                rows
+            )
+
+    def index_posts(self, posts):
+        self.replace(TABLE, COLUMNS, [
+            (
+                post.pk,
+                to_document(post.text),
+                to_document(post.group.title if post.group_id else ''),
+                author_document(post.author),
+            )
+            for post in posts
+        ])
+
+    def remove_post(self, post_id):
+        # Строки комментариев удаляются сигналами самих комментариев.
+        self.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+    def index_comments(self, comments):
+        self.replace(COMMENTS_TABLE, ('comments', 'post_id'), [
+            (comment.pk, to_document(comment.text), comment.post_id)
+            for comment in comments
+        ])
+
+    def remove_comment(self, comment_id):
+        self.execute(
+            f'DELETE FROM {COMMENTS_TABLE} WHERE rowid = %s', [comment_id]
+        )
+
+    def update_posts(self, column, value, condition, params):
+        # Строки, где значение не изменилось, не переписываются.
+        self.execute(
+            f'UPDATE {TABLE} SET {column} = %s WHERE {column} != %s '
+            f'AND rowid IN (SELECT id FROM {Post._meta.db_table} '
+            f'WHERE {condition})',
+            [value, value, *params]
+        )
+
+    def update_group(self, group):
+        self.update_posts('grp', to_document(group.title),
+                          'group_id = %s', [group.pk])
+
+    def update_posts_without_group(self):
+        self.update_posts('grp', '', 'group_id IS NULL', [])
+
+    def update_author(self, user):
+        self.update_posts('author', author_document(user),
+                          'author_id = %s', [user.pk])
+
+    def clear(self):
+        self.execute(f'DELETE FROM {TABLE}')
+        self.execute(f'DELETE FROM {COMMENTS_TABLE}')
+
+    def to_terms(self, query):
+        """
+        Основы запроса для MATCH. Каждая берётся в кавычки, чтобы
+        символы запроса не толковались как синтаксис FTS5.
+        """
+        return [
+            '"{}"'.format(word.replace('"', '""'))
+            for word in dict.fromkeys(stem_text(query))
+        ]
+
+    def hits(self, terms):
+        """
+        Запрос id постов, в которых встретились все основы: каждая —
+        в самом посте или в любом из его комментариев.
+        """
+        sql = ' INTERSECT '.join(
+            f'SELECT post_id FROM ('
+            f'SELECT rowid AS post_id FROM {TABLE} WHERE {TABLE} MATCH %s '
+            f'UNION SELECT post_id FROM {COMMENTS_TABLE} '
+            f'WHERE {COMMENTS_TABLE} MATCH %s)'
+            for _ in terms
+        )
+        return sql, [term for term in terms for _ in range(2)]
+
+    def search(self, query, offset, limit):
+        terms = self.to_terms(query)
+        if not terms:
+            return []
+        hits, params = self.hits(terms)
+        weights = ', '.join(str(weight) for weight in WEIGHTS)
+        # Пост ранжируется по своему BM25 и лучшему из комментариев.
+        # LIMIT -1 не даёт SQLite развернуть подзапрос с bm25()
+        # внутрь MIN(): там вспомогательные функции FTS5 недоступны.
+        rows = self.execute(
+            f'SELECT hits.post_id FROM ({hits}) AS hits '
+            f'LEFT JOIN (SELECT rowid AS post_id, '
+            f'bm25({TABLE}, {weights}) AS rank '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s) AS posts '
+            f'ON posts.post_id = hits.post_id '
+            f'LEFT JOIN (SELECT post_id, MIN(rank) * {COMMENTS_WEIGHT} '
+            f'AS rank FROM (SELECT post_id, bm25({COMMENTS_TABLE}) AS rank '
+            f'FROM {COMMENTS_TABLE} WHERE {COMMENTS_TABLE} MATCH %s '
+            f'LIMIT -1) GROUP BY post_id) AS comments '
+            f'ON comments.post_id = hits.post_id '
+            f'ORDER BY COALESCE(posts.rank, 0) + COALESCE(comments.rank, 0), '
+            f'hits.post_id DESC LIMIT %s OFFSET %s',
+            [*params, ' OR '.join(terms), ' OR '.join(terms), limit, offset]
+        )
+        return [row[0] for row in rows]
+
+    def count(self, query):
+        terms = self.to_terms(query)
+        if not terms:
+            return 0
+        hits, params = self.hits(terms)
+        return self.execute(
+            f'SELECT COUNT(*) FROM ({hits})', params
+        )[0][0]
+
+
+@lru_cache(maxsize=None)
+def get_backend(path=None):
+    return import_string(path or settings.POST_SEARCH_BACKEND)()
+
+
+class SearchResults:
+    """
+    Результаты поиска как последовательность для Paginator:
+    срез запрашивает у хранилища только id своей страницы
+    и загружает эти посты одним запросом.
+    """
+
+    def __init__(self, query, backend=None):
+        self.query = query
+        self.backend = backend or get_backend()
+
+    @cached_property
+    def total(self):
+        return self.backend.count(self.query)
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = self.total if key.stop is None else key.stop
+        ids = self.backend.search(self.query, start, stop - start)
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def index_queryset(posts, batch_size=1000):
+    """
+    Индексирует посты posts и их комментарии пачками по id.
+    Возвращает число постов. Для постов, вставленных в обход
+    сигналов (bulk_create).
+    """
+    backend = get_backend()
+    posts = posts.for_feed().order_by('id')
+    last = 0
+    total = 0
+    while True:
+        batch = list(posts.filter(id__gt=last)[:batch_size])
+        backend.index_posts(batch)
+        backend.index_comments(
+            Comment.objects.filter(post__in=batch)
+            .only('text', 'post_id').iterator(chunk_size=batch_size)
+        )
+        total += len(batch)
+        if len(batch) < batch_size:
+            return total
+        last = batch[-1].pk
+
+
+def rebuild(batch_size=1000):
+    """Перестраивает индекс целиком. Возвращает число постов."""
+    get_backend().clear()
+    return index_queryset(Post.objects.all(), batch_size)
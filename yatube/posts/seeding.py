@@ -0,0 +1,240 @@
+"""
+Заполнение базы синтетическими данными для нагрузочных замеров.
+
+Строки генерируются пачками (при необходимости в нескольких
+процессах, см. fakedata) и вставляются bulk_create. Сигналы
+при bulk_create не срабатывают, поэтому в конце пересчитываются
+счётчики, индексируются новые посты и сбрасывается кеш лент.
+"""
+import copy
+import datetime
+import multiprocessing
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import transaction
+from django.db.models import AutoField
+from django.utils import timezone
+
+from . import fakedata, follow_graph, search
+from .caching import bump_feed_version
+from .counters import (bulk_batch_size, reconcile_authors,
+                       reconcile_comment_counts)
+from .models import Comment, Follow, Group, Post, User
+
+DEFAULT_VOLUMES = {
+    'users': 50,
+    'groups': 5,
+    'posts': 1000,
+    'comments': 2000,
+    'follows': 500,
+}
+CHUNK_SIZE = 10000
+# Даты отсчитываются от постоянного момента, а не от текущего
+# времени: одинаковый seed даёт одинаковые данные в любой день.
+DEFAULT_END = datetime.datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def insert_fields(model):
+    """
+    Поля для вставки. auto_now_add подставляет текущее время и в
+    bulk_create, поэтому у полей дат он снят — на копиях полей, а не
+    на общих полях модели, которыми пользуются остальные потоки.
+    """
+    fields = []
+    for field in model._meta.concrete_fields:
+        if isinstance(field, AutoField):
+            continue
+        if getattr(field, 'auto_now_add', False):
+            field = copy.copy(field)
+            field.auto_now_add = False
+        fields.append(field)
+    return fields
+
+
+def to_datetime(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def last_pk(model):
+    return model.objects.order_by('-pk').values_list('pk', flat=True).first()
+
+
+class Seeder:
+    """
+    Один прогон заполнения. Генераторы из fakedata оперируют
+    индексами, Seeder переводит их в первичные ключи вставленных строк.
+    """
+
+    def __init__(self, seed=0, batch_size=1000, prefix='bench',
+                 processes=1, days=365, end=DEFAULT_END, log=None):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.processes = processes
+        self.end = end.timestamp()
+        self.span = days * 86400
+        self.begin = self.end - self.span
+        self.log = log or (lambda kind, done: None)
+        self.after = {
+            model: last_pk(model) or 0 for model in (User, Group, Post)
+        }
+
+    def insert(self, model, objects, ignore_conflicts=False):
+        """bulk_create, сохраняющий даты самих объектов."""
+        fields = insert_fields(model)
+        batch_size = bulk_batch_size(model, self.batch_size)
+        for start in range(0, len(objects), batch_size):
+            model._base_manager._insert(
+                objects[start:start + batch_size],
+                fields=fields,
+                ignore_conflicts=ignore_conflicts
+            )
+
+    def new_pks(self, model):
+        """Ключи строк этого прогона в порядке вставки."""
+        return list(
+            model.objects.filter(pk__gt=self.after[model])
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def generate(self, model, function, tasks, build, **kwargs):
+        """
+        Генерирует пачки строк function(task) и вставляет объекты
+        build(*row). Пачки идут в исходном порядке при любом числе
+        процессов.
+        """
+        done = 0
+        if self.processes > 1:
+            pool = multiprocessing.Pool(self.processes)
+            chunks = pool.imap(function, tasks)
+        else:
+            pool = None
+            chunks = map(function, tasks)
+        try:
+            for rows in chunks:
+                self.insert(model, [build(*row) for row in rows], **kwargs)
+                done += len(rows)
+                self.log(model._meta.verbose_name_plural, done)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def seed_users(self, total):
+        for _, start, count in fakedata.chunk_bounds(total, CHUNK_SIZE):
+            self.insert(User, [
+                User(username=f'{self.prefix}{index}',
+                     password=UNUSABLE_PASSWORD_PREFIX)
+                for index in range(start, start + count)
+            ])
+            self.log(User._meta.verbose_name_plural, start + count)
+        self.users = self.new_pks(User)
+
+    def seed_groups(self, total):
+        self.insert(Group, [
+            Group(title=f'Сообщество {index}',
+                  slug=f'{self.prefix}-{index}',
+                  description='Сообщество для нагрузочных замеров')
+            for index in range(total)
+        ])
+        self.groups = self.new_pks(Group)
+
+    def seed_posts(self, total):
+        total = total if self.users else 0
+        users, groups = self.users, self.groups
+
+        def build(text, author, group, timestamp):
+            return Post(
+                text=text,
+                author_id=users[author],
+                group_id=None if group is None else groups[group],
+                pub_date=to_datetime(timestamp)
+            )
+
+        tasks = (
+            (self.seed, number, start, count, total, len(users),
+             len(groups), self.begin, self.span)
+            for number, start, count in fakedata.chunk_bounds(
+                total, CHUNK_SIZE
+            )
+        )
+        self.generate(Post, fakedata.post_rows, tasks, build)
+        self.posts = self.new_pks(Post)
+
+    def seed_comments(self, total):
+        total = total if self.posts else 0
+        users, posts = self.users, self.posts
+
+        def build(text, post, author, timestamp):
+            return Comment(
+                text=text,
+                post_id=posts[post],
+                author_id=users[author],
+                created=to_datetime(timestamp)
+            )
+
+        tasks = (
+            (self.seed, number, count, len(posts), len(users),
+             self.begin, self.span)
+            for number, _, count in fakedata.chunk_bounds(total, CHUNK_SIZE)
+        )
+        self.generate(Comment, fakedata.comment_rows, tasks, build)
+
+    def seed_follows(self, total):
+        total = total if len(self.users) > 1 else 0
+        users = self.users
+
+        def build(user, author):
+            return Follow(user_id=users[user], author_id=users[author])
+
+        tasks = (
+            (self.seed, number, count, len(users))
+            for number, _, count in fakedata.chunk_bounds(total, CHUNK_SIZE)
+        )
+        # Повторы между пачками отбрасывает уникальное ограничение.
+        self.generate(
+            Follow, fakedata.follow_rows, tasks, build, ignore_conflicts=True
+        )
+
+    def finish(self):
+        """
+        Счётчики, пути комментариев, поисковый индекс, граф подписок
+        и кеш лент после вставки в обход сигналов.
+        """
+        users = User.objects.filter(pk__gt=self.after[User])
+        posts = Post.objects.filter(pk__gt=self.after[Post])
+        reconcile_authors(users, self.batch_size)
+        reconcile_comment_counts(posts, self.batch_size)
+        Comment.objects.filter(post__in=posts).fill_root_paths()
+        search.index_queryset(posts, self.batch_size)
+        # Новые пользователи подписывались и на уже существующих.
+        followed = list(
+            Follow.objects.filter(user__in=users)
+            .values_list('author_id', flat=True).distinct()
+        )
+        transaction.on_commit(lambda: follow_graph.forget(followed))
+        transaction.on_commit(bump_feed_version)
+        return {
+            'users': len(self.users),
+            'groups': len(self.groups),
+            'posts': len(self.posts),
+            'comments': Comment.objects.filter(post__in=posts).count(),
+            'follows': Follow.objects.filter(user__in=users).count(),
+        }
+
+
+@transaction.atomic
+def seed_database(volumes=None, **kwargs):
+    """
+    Создаёт пользователей, сообщества, посты, комментарии и подписки
+    и возвращает число созданных строк по видам. Одинаковый seed
+    даёт одинаковые данные при любом числе процессов.
+    """
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    seeder = Seeder(**kwargs)
+    seeder.seed_users(volumes['users'])
+    seeder.seed_groups(volumes['groups'])
+    seeder.seed_posts(volumes['posts'])
+    seeder.seed_comments(volumes['comments'])
+    seeder.seed_follows(volumes['follows'])
+    return seeder.finish()
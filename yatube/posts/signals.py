@@ -0,0 +1,186 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import (counters, follow_graph, media, profiles, search, tags,
+               thumbnails, timeline)
+from .caching import bump_feed_version, bump_profile_version
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+AUTHOR_NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: timeline.push_post(instance))
+
+
+@receiver(post_save, sender=Post)
+def link_tags(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tags.link_posts([instance])
+
+
+@receiver(post_save, sender=Post)
+def prepare_thumbnails(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        thumbnails.schedule(instance.image)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_image', None)
+    instance._loaded_image = instance.image.name
+    if loaded and loaded != instance.image.name:
+        transaction.on_commit(lambda: media.release_image(loaded))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: media.release_image(name))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_graph(sender, instance, **kwargs):
+    user_id, author_id = instance.user_id, instance.author_id
+    transaction.on_commit(
+        lambda: follow_graph.invalidate(user_id, author_id)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        user_id, author_id = instance.user_id, instance.author_id
+        transaction.on_commit(lambda: timeline.backfill(user_id, author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    user_id, author_id = instance.user_id, instance.author_id
+    transaction.on_commit(lambda: timeline.prune(user_id, author_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_feeds(sender, **kwargs):
+    # После фиксации: страница, собранная до неё под новой версией,
+    # осталась бы в кеше со старыми данными.
+    transaction.on_commit(bump_feed_version)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_profiles(sender, **kwargs):
+    transaction.on_commit(bump_profile_version)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_profile(sender, instance, created, raw=False,
+                              update_fields=None, **kwargs):
+    # Сводка профиля показывает имя автора (см. posts.profiles).
+    if raw or (
+            update_fields and not AUTHOR_NAME_FIELDS & set(update_fields)):
+        return
+    if not created:
+        transaction.on_commit(bump_profile_version)
+    author_id, username = instance.pk, instance.username
+    transaction.on_commit(lambda: profiles.forget(author_id, username))
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_author(sender, instance, **kwargs):
+    transaction.on_commit(bump_profile_version)
+    author_id, username = instance.pk, instance.username
+    transaction.on_commit(lambda: profiles.forget(author_id, username))
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(author=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_author_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_author_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comment_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_author_stats(instance.author_id, followers_count=1)
+        counters.change_author_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_author_stats(instance.author_id, followers_count=-1)
+    counters.change_author_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index_posts([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.get_backend().remove_comment(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.get_backend().update_group(instance)
+
+
+@receiver(post_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    # Посты группы к этому моменту уже отвязаны (SET_NULL).
+    search.get_backend().update_posts_without_group()
+
+
+@receiver(post_save, sender=User)
+def index_author(sender, instance, created, raw=False, update_fields=None,
+                 **kwargs):
+    # Вход пользователя сохраняет только last_login: имя не менялось.
+    if created or raw or (
+            update_fields and not AUTHOR_NAME_FIELDS & set(update_fields)):
+        return
+    search.get_backend().update_author(instance)
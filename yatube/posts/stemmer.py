@@ -0,0 +1,123 @@
+"""
+Стеммер Портера (Snowball) для русского языка.
+
+Поиску нужна одна форма слова для «котов», «коты» и «котам»,
+а сторонние библиотеки морфологии проекту не нужны ради одной
+функции. Алгоритм: http://snowball.tartarus.org/algorithms/russian/
+Слова не на кириллице возвращаются без изменений.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile(r'^[а-я]+$')
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую',
+     'юю', 'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+     'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+)
+DERIVATIONAL = ('ост', 'ость')
+SUPERLATIVE = ('ейше', 'ейш')
+
+
+def region(word, start=0):
+    """Начало области после первой пары «гласная, согласная»."""
+    for index in range(start + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def remove_ending(rv, endings):
+    """
+    Отрезает самое длинное окончание из endings. Окончания первой
+    группы отрезаются только после «а» или «я». Возвращает None,
+    если подходящего окончания нет.
+    """
+    after_a, plain = endings
+    for ending in sorted(after_a + plain, key=len, reverse=True):
+        if not rv.endswith(ending):
+            continue
+        stem = rv[:-len(ending)]
+        if ending in plain:
+            return stem
+        return stem if stem.endswith(('а', 'я')) else None
+    return None
+
+
+def step_one(rv):
+    stem = remove_ending(rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    rv = remove_ending(rv, REFLEXIVE) or rv
+    stem = remove_ending(rv, ADJECTIVE)
+    if stem is not None:
+        return remove_ending(stem, PARTICIPLE) or stem
+    for endings in (VERB, NOUN):
+        stem = remove_ending(rv, endings)
+        if stem is not None:
+            return stem
+    return rv
+
+
+def step_four(rv):
+    for ending in SUPERLATIVE:
+        if rv.endswith(ending):
+            rv = rv[:-len(ending)]
+            break
+    if rv.endswith('нн'):
+        return rv[:-1]
+    if rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+def stem(word):
+    """Основа слова word в нижнем регистре."""
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.match(word):
+        return word
+    start = next(
+        (index + 1 for index, letter in enumerate(word) if letter in VOWELS),
+        len(word)
+    )
+    r2 = region(word, region(word))
+    prefix, rv = word[:start], word[start:]
+    rv = step_one(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    for ending in DERIVATIONAL:
+        if rv.endswith(ending) and start + len(rv) - len(ending) >= r2:
+            rv = rv[:-len(ending)]
+            break
+    return prefix + step_four(rv)
+
+
+def stem_text(text):
+    """Основы всех слов текста в исходном порядке."""
+    return [stem(word) for word in WORD.findall(text or '')]
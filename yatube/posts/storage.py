@@ -0,0 +1,80 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+DIGEST_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, где имя файла — SHA-256 его содержимого:
+    posts/IMG_6737.JPG сохраняется как posts/ab/ab…ef.jpg.
+
+    Хеш считается по ходу записи загрузки во временный файл рядом
+    с целевым. Если файл с таким содержимым уже есть, временный
+    удаляется и возвращается имя существующего, поэтому одинаковые
+    загрузки занимают место один раз, а время изменения файла
+    обновляется. Удалять файлы можно только после проверки, что на
+    них больше не ссылается ни один пост и что их давно не
+    записывали (см. posts.media.release_image).
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяет содержимое, суффиксы не нужны.
+        return name
+
+    @staticmethod
+    def is_digest_name(name):
+        return bool(DIGEST_NAME.search(name))
+
+    @staticmethod
+    def digest_name(name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    @staticmethod
+    def reuse(path):
+        """
+        Обновляет время изменения существующего файла: строка поста
+        с ним появится только после сохранения, и до тех пор файл
+        без ссылок не должен считаться старым (см. release_image).
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=directory, prefix='.upload-'
+        )
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(descriptor, 'wb') as temp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            name = self.digest_name(name, digest.hexdigest())
+            path = self.path(name)
+            if self.reuse(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
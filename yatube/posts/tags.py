@@ -0,0 +1,110 @@
+"""
+Хештеги и упоминания в тексте постов.
+
+При сохранении поста из текста выбираются #теги и @имена, и связи
+PostTag и Mention приводятся к найденному: лишние удаляются, новые
+добавляются пачкой. Ленты тегов и упоминаний строятся соединением
+по индексам этих таблиц, а не поиском подстроки в Post.text.
+Старые посты размечаются командой backfill_tags.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .counters import bulk_batch_size
+from .models import Mention, PostTag, Tag, User
+
+TAG_MAX_LENGTH = Tag._meta.get_field('name').max_length
+HASHTAG = re.compile(r'(?<![\w&#])#(\w+)')
+# Имена пользователей Django: буквы, цифры и символы @.+-_.
+MENTION = re.compile(r'(?<![\w@])@([\w.@+-]+)')
+
+
+def parse_tags(text):
+    """Теги текста в нижнем регистре без повторов."""
+    return list(dict.fromkeys(
+        name.lower() for name in HASHTAG.findall(text or '')
+        if len(name) <= TAG_MAX_LENGTH
+    ))
+
+
+def parse_mentions(text):
+    """Упомянутые имена без повторов; точка в конце — знак препинания."""
+    return list(dict.fromkeys(
+        name.rstrip('.') for name in MENTION.findall(text or '')
+        if name.rstrip('.')
+    ))
+
+
+def get_tag_ids(names):
+    """id тегов с именами names; недостающие теги создаются."""
+    if not names:
+        return {}
+    tags = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in tags]
+    if missing:
+        # Одновременное сохранение другого поста могло создать тот
+        # же тег: конфликты пропускаются, id перечитываются.
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing],
+            batch_size=bulk_batch_size(Tag, len(missing)),
+            ignore_conflicts=True
+        )
+        tags.update(
+            Tag.objects.filter(name__in=missing).values_list('name', 'id')
+        )
+    return tags
+
+
+def sync_links(model, field, post_ids, wanted):
+    """
+    Приводит связи model (post, field) постов post_ids к множеству
+    пар wanted: удаляет лишние и добавляет недостающие.
+    """
+    existing = set(
+        model.objects.filter(post_id__in=post_ids)
+        .values_list('post_id', f'{field}_id')
+    )
+    stale = existing - wanted
+    if stale:
+        model.objects.filter(reduce(or_, (
+            Q(post_id=post_id, **{f'{field}_id': other_id})
+            for post_id, other_id in stale
+        ))).delete()
+    new = wanted - existing
+    if new:
+        model.objects.bulk_create(
+            [
+                model(post_id=post_id, **{f'{field}_id': other_id})
+                for post_id, other_id in new
+            ],
+            batch_size=bulk_batch_size(model, len(new)),
+            ignore_conflicts=True
+        )
+
+
+def link_posts(posts):
+    """Размечает теги и упоминания постов posts по их текстам."""
+    posts = list(posts)
+    if not posts:
+        return
+    post_ids = [post.pk for post in posts]
+    tags = {post.pk: parse_tags(post.text) for post in posts}
+    mentions = {post.pk: parse_mentions(post.text) for post in posts}
+    tag_ids = get_tag_ids({name for names in tags.values() for name in names})
+    usernames = {name for names in mentions.values() for name in names}
+    user_ids = dict(
+        User.objects.filter(username__in=usernames)
+        .values_list('username', 'id')
+    ) if usernames else {}
+    sync_links(PostTag, 'tag', post_ids, {
+        (post_id, tag_ids[name])
+        for post_id, names in tags.items() for name in names
+    })
+    sync_links(Mention, 'user', post_ids, {
+        (post_id, user_ids[name])
+        for post_id, names in mentions.items() for name in names
+        if name in user_ids
+    })
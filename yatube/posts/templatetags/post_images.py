@@ -0,0 +1,51 @@
+from django import template
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+def srcset(variants):
+    return ', '.join(
+        f'{default_storage.url(path)} {width}w'
+        for path, width, _ in variants
+    )
+
+
+@register.inclusion_tag('includes/posts/post_picture.html')
+def post_picture(post):
+    """
+    Разметка <picture> с вариантами картинки поста во всех форматах.
+    Манифест берётся из строки поста; в кеш идёт только пост, чья
+    копия ещё не заполнена. Пока варианты не готовы, картинка
+    ставится в очередь, а вместо неё выводится заглушка:
+    рендеринг их не ждёт.
+    """
+    manifest = post.variants or thumbnails.get_manifest(post.image)
+    if manifest is None:
+        thumbnails.schedule(post.image)
+        return {'ready': False}
+    fallback = manifest[thumbnails.FALLBACK_FORMAT]
+    path, width, height = next(
+        (variant for variant in reversed(fallback)
+         if variant[1] <= settings.POST_IMAGE_DEFAULT_WIDTH),
+        fallback[0]
+    )
+    return {
+        'ready': True,
+        'sources': [
+            {
+                'type': thumbnails.FORMATS[name][1],
+                'srcset': srcset(variants),
+            }
+            for name, variants in manifest.items()
+            if name != thumbnails.FALLBACK_FORMAT
+        ],
+        'src': default_storage.url(path),
+        'srcset': srcset(fallback),
+        'sizes': settings.POST_IMAGE_SIZES,
+        'width': width,
+        'height': height,
+    }
@@ -0,0 +1,38 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts import tags
+
+register = template.Library()
+
+
+def tag_link(match):
+    name = match.group(1)
+    if len(name) > tags.TAG_MAX_LENGTH:
+        return match.group(0)
+    return format_html(
+        '<a href="{}">#{}</a>',
+        reverse('posts:tag', args=[name.lower()]),
+        name
+    )
+
+
+def mention_link(match):
+    name = match.group(1).rstrip('.')
+    if not name:
+        return match.group(0)
+    return format_html(
+        '<a href="{}">@{}</a>{}',
+        reverse('posts:profile', args=[name]),
+        name,
+        match.group(1)[len(name):]
+    )
+
+
+@register.filter
+def link_tags(text):
+    """Текст поста со ссылками на ленты #тегов и профили @авторов."""
+    text = tags.HASHTAG.sub(tag_link, escape(text))
+    return mark_safe(tags.MENTION.sub(mention_link, text))
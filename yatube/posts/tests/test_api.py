@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+API_INDEX_URL = 'api:index'
+API_POST_URL = 'api:post'
+API_GROUP_URL = 'api:group'
+API_PROFILE_URL = 'api:profile'
+API_USER_POSTS_URL = 'api:user_posts'
+
+
+def run_on_commit(callback):
+    callback()
+
+
+class ApiTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='split')
+        self.group = Group.objects.create(
+            title='Хорватия', slug='croatia', description='Поездки'
+        )
+        self.post = Post.objects.create(
+            text='Дубровник', author=self.user, group=self.group
+        )
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Красиво')
+        self.client = Client()
+
+    def test_feeds(self):
+        """Ленты отдают те же посты, что и HTML-страницы."""
+        for url in (reverse(API_INDEX_URL),
+                    reverse(API_GROUP_URL, args=[self.group.slug]),
+                    reverse(API_USER_POSTS_URL, args=[self.user.username])):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(data['results'][0]['id'], self.post.pk)
+                self.assertEqual(data['results'][0]['group'], 'croatia')
+                self.assertIsNone(data['next'])
+
+    def test_post_with_comments(self):
+        data = self.client.get(
+            reverse(API_POST_URL, args=[self.post.pk])
+        ).json()
+        self.assertEqual(data['text'], 'Дубровник')
+        self.assertEqual(data['comment_count'], 1)
+        self.assertEqual(data['comments']['results'][0]['text'], 'Красиво')
+
+    @override_settings(COMMENTS_PER_PAGE=1, POSTS_PER_PAGE=10)
+    def test_post_comments_use_comment_page_size(self):
+        """Комментарии поста делятся на страницы по COMMENTS_PER_PAGE."""
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Очень красиво')
+        data = self.client.get(
+            reverse(API_POST_URL, args=[self.post.pk])
+        ).json()
+        self.assertEqual(len(data['comments']['results']), 1)
+        self.assertIsNotNone(data['comments']['next'])
+
+    def test_profile(self):
+        data = self.client.get(
+            reverse(API_PROFILE_URL, args=[self.user.username])
+        ).json()
+        self.assertEqual(data['posts_count'], 1)
+        self.assertEqual(
+            data['posts'],
+            reverse(API_USER_POSTS_URL, args=[self.user.username])
+        )
+
+    def test_missing_object_is_json_404(self):
+        response = self.client.get(reverse(API_POST_URL, args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Не найдено'})
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_cursor_pagination(self):
+        """Ссылка next ведёт на следующую страницу ленты."""
+        newer = Post.objects.create(text='Сплит', author=self.user)
+        data = self.client.get(reverse(API_INDEX_URL)).json()
+        self.assertEqual(data['results'][0]['id'], newer.pk)
+        data = self.client.get(data['next']).json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+
+    @mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+    def test_unchanged_feed_is_not_modified_without_queries(self):
+        """Повторный опрос с ETag получает 304 без запросов к базе."""
+        url = reverse(API_INDEX_URL)
+        response = self.client.get(url)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            repeated = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(repeated.status_code, 304)
+        Post.objects.create(text='Новый пост', author=self.user)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    @mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag профиля, но не лент."""
+        follower = User.objects.create_user(username='hannover')
+        profile_url = reverse(API_PROFILE_URL, args=[self.user.username])
+        index_url = reverse(API_INDEX_URL)
+        profile_etag = self.client.get(profile_url)['ETag']
+        index_etag = self.client.get(index_url)['ETag']
+        Follow.objects.create(user=follower, author=self.user)
+        self.assertNotEqual(self.client.get(profile_url)['ETag'],
+                            profile_etag)
+        self.assertEqual(self.client.get(index_url)['ETag'], index_etag)
+
+    def test_only_safe_methods(self):
+        response = self.client.post(reverse(API_INDEX_URL))
+        self.assertEqual(response.status_code, 405)
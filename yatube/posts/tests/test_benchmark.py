@@ -0,0 +1,146 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from posts.benchmark import compare, percentile, run_benchmark
+from posts.models import AuthorStats, Comment, Follow, Post, User
+from posts.seeding import DEFAULT_END, seed_database
+
+VOLUMES = {
+    'users': 6,
+    'groups': 2,
+    'posts': 30,
+    'comments': 20,
+    'follows': 10,
+}
+
+
+class BenchmarkTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        seed_database(VOLUMES, seed=1)
+
+    def test_seed_volumes_and_counters(self):
+        """Заполнение создаёт заданный объём и сверяет счётчики."""
+        self.assertEqual(Post.objects.count(), VOLUMES['posts'])
+        self.assertEqual(Comment.objects.count(), VOLUMES['comments'])
+        self.assertLessEqual(Follow.objects.count(), VOLUMES['follows'])
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            VOLUMES['posts']
+        )
+
+    def test_report_covers_views(self):
+        """В отчёте есть все представления с числом запросов."""
+        report = run_benchmark(repeat=2, volumes=VOLUMES)
+        self.assertEqual(
+            set(report['views']),
+            {'index', 'group_posts', 'profile', 'post_view',
+             'follow_index', 'add_comment'}
+        )
+        for name, result in report['views'].items():
+            with self.subTest(view=name):
+                self.assertIn(result['status'], (200, 302))
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+    def test_compare_reports_regressions(self):
+        """Рост числа запросов и p95 сверх допуска — регрессия."""
+        baseline = {'views': {'index': {'queries': 3, 'p95_ms': 10.0}}}
+        same = {'views': {'index': {'queries': 3, 'p95_ms': 11.0}}}
+        worse = {'views': {'index': {'queries': 4, 'p95_ms': 13.0}}}
+        self.assertEqual(compare(baseline, same, tolerance=0.2), [])
+        self.assertEqual(len(compare(baseline, worse, tolerance=0.2)), 2)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }})
+    def test_command_does_not_touch_shared_cache(self):
+        """Команда сбрасывает только свой локальный кеш."""
+        used = []
+
+        def benchmark(*args):
+            used.append(settings.CACHES['default']['BACKEND'])
+            return {'views': {}}
+
+        command = 'posts.management.commands.benchmark_views.'
+        # Тестовая база и окружение уже есть, замер подменён.
+        with mock.patch.object(connection.creation, 'create_test_db'), \
+                mock.patch.object(connection.creation, 'destroy_test_db'), \
+                mock.patch(command + 'setup_test_environment'), \
+                mock.patch(command + 'teardown_test_environment'), \
+                mock.patch(command + 'run_benchmark', benchmark):
+            call_command('benchmark_views', stdout=StringIO())
+        self.assertEqual(
+            used, ['django.core.cache.backends.locmem.LocMemCache']
+        )
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+
+
+class SeedingTest(TestCase):
+
+    def texts(self, prefix):
+        return list(
+            Post.objects.filter(author__username__startswith=prefix)
+            .order_by('pk').values_list('text', 'author__username')
+        )
+
+    def dates(self, prefix):
+        return list(
+            Post.objects.filter(author__username__startswith=prefix)
+            .order_by('pk').values_list('pub_date', flat=True)
+        )
+
+    def test_same_seed_same_data(self):
+        """Данные зависят только от seed, но не от числа процессов."""
+        seed_database(VOLUMES, seed=3, prefix='one')
+        seed_database(VOLUMES, seed=3, prefix='two', processes=2)
+        seed_database(VOLUMES, seed=4, prefix='other')
+        one = [(text, name[3:]) for text, name in self.texts('one')]
+        two = [(text, name[3:]) for text, name in self.texts('two')]
+        other = [(text, name[5:]) for text, name in self.texts('other')]
+        self.assertEqual(one, two)
+        self.assertNotEqual(one, other)
+
+    def test_dates_are_spread(self):
+        """Даты постов и комментариев берутся из генератора."""
+        seed_database(VOLUMES, days=30)
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater((max(dates) - min(dates)).days, 20)
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+
+    def test_dates_do_not_depend_on_current_time(self):
+        """Даты задаются концом периода, модель Post не меняется."""
+        seed_database(VOLUMES, seed=3, prefix='one')
+        seed_database(VOLUMES, seed=3, prefix='two',
+                      end=DEFAULT_END + datetime.timedelta(days=1))
+        one = self.dates('one')
+        two = self.dates('two')
+        self.assertLessEqual(max(one), DEFAULT_END)
+        self.assertEqual(
+            [date + datetime.timedelta(days=1) for date in one], two
+        )
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        post = Post.objects.create(text='Сейчас', author=User.objects.first())
+        self.assertGreater(post.pub_date, DEFAULT_END)
+
+    def test_command_refuses_existing_prefix(self):
+        call_command('seed_yatube', users=3, posts=5, comments=0,
+                     follows=2, prefix='load', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_yatube', users=3, prefix='load')
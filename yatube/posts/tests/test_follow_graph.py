@@ -0,0 +1,125 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import follow_graph
+from posts.models import Follow, User
+
+
+def run_on_commit(callback):
+    callback()
+
+
+class FollowGraphTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='split')
+        self.authors = [
+            User.objects.create_user(username=name)
+            for name in ('zagreb', 'hannover', 'berlin')
+        ]
+
+    def test_arrays_are_sorted(self):
+        """Массивы подписок и подписчиков отсортированы по id."""
+        for author in reversed(self.authors):
+            Follow.objects.create(user=self.user, author=author)
+        self.assertEqual(
+            list(follow_graph.get_following(self.user.pk)),
+            sorted(author.pk for author in self.authors)
+        )
+        self.assertEqual(
+            list(follow_graph.get_followers(self.authors[0].pk)),
+            [self.user.pk]
+        )
+
+    @mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+    def test_loaded_graph_needs_no_queries(self):
+        """Загруженный граф отвечает без запросов и следит за подписками."""
+        author, other, _ = self.authors
+        Follow.objects.create(user=self.user, author=author)
+        Follow.objects.create(user=self.user, author=other)
+        Follow.objects.filter(user=self.user, author=author).delete()
+        follow_graph.get_following(self.user.pk)
+        follow_graph.get_followers(other.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follow_graph.is_following(self.user.pk, author.pk)
+            )
+            self.assertTrue(
+                follow_graph.is_following(self.user.pk, other.pk)
+            )
+            self.assertEqual(
+                list(follow_graph.get_followers(other.pk)), [self.user.pk]
+            )
+
+    def test_concurrent_follows_are_not_lost(self):
+        """
+        Одновременные подписки на одного автора: массив, прочитанный
+        до фиксации обеих, сбрасывается, и обе подписки видны.
+        """
+        author = self.authors[0]
+        readers = [
+            User.objects.create_user(username=f'reader{index}')
+            for index in range(2)
+        ]
+        callbacks = []
+        with mock.patch('posts.signals.transaction.on_commit',
+                        callbacks.append):
+            Follow.objects.create(user=readers[0], author=author)
+            # Параллельный читатель заполняет кеш до фиксации второй.
+            follow_graph.get_followers(author.pk)
+            Follow.objects.create(user=readers[1], author=author)
+        for callback in reversed(callbacks):
+            callback()
+        self.assertEqual(
+            list(follow_graph.get_followers(author.pk)),
+            [reader.pk for reader in readers]
+        )
+        self.assertTrue(follow_graph.is_following(readers[1].pk, author.pk))
+
+    def test_miss_written_after_commit_is_not_used(self):
+        """
+        Массив, прочитанный из базы до фиксации подписки и записанный
+        в кеш после неё, не выдаётся за актуальный.
+        """
+        author = self.authors[0]
+        callbacks = []
+        store = follow_graph._store
+
+        def commit_and_store(values, versions):
+            # Запрос уже выполнен, когда чужая подписка фиксируется
+            # и сбрасывает массивы.
+            with mock.patch('posts.signals.transaction.on_commit',
+                            callbacks.append):
+                Follow.objects.create(user=self.user, author=author)
+            for callback in callbacks:
+                callback()
+            store(values, versions)
+
+        with mock.patch.object(follow_graph, '_store', commit_and_store):
+            self.assertEqual(list(follow_graph.get_followers(author.pk)), [])
+        self.assertEqual(
+            list(follow_graph.get_followers(author.pk)), [self.user.pk]
+        )
+
+    def test_rebuild(self):
+        """Перестройка записывает массивы всех пользователей, и пустые."""
+        Follow.objects.create(user=self.user, author=self.authors[1])
+        call_command('rebuild_follow_graph', '--batch-size', '2',
+                     stdout=StringIO())
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(follow_graph.get_following(self.user.pk)),
+                [self.authors[1].pk]
+            )
+            self.assertEqual(
+                list(follow_graph.get_followers(self.authors[1].pk)),
+                [self.user.pk]
+            )
+            self.assertEqual(
+                list(follow_graph.get_followers(self.authors[0].pk)), []
+            )
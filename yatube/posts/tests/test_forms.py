@@ -1,3 +1,5 @@
+import hashlib
+import io
 import shutil
 import tempfile
 
@@ -5,7 +7,9 @@ from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from posts.forms import PostForm
 from posts.models import Group, Post, User
 
 HOMEPAGE_URL = 'posts:index'
@@ -80,9 +84,10 @@ class PostCreateFormTests(TestCase):
             Post.objects.first(),
             Post.objects.get(text=self.POST_TEXT, group=1, author=self.user)
         )
+        digest = hashlib.sha256(image).hexdigest()
         self.assertEqual(
             Post.objects.first(),
-            Post.objects.get(image='posts/small.gif')
+            Post.objects.get(image=f'posts/{digest[:2]}/{digest}.gif')
         )
 
     def test_cant_create_post_without_text(self):
@@ -126,3 +131,57 @@ class PostCreateFormTests(TestCase):
                 author=self.user
             )
         )
+
+
+@override_settings(POST_IMAGE_MAX_DIMENSION=100)
+class PostImageUploadTests(TestCase):
+
+    @staticmethod
+    def make_upload(name, size, image_format='JPEG', mode='RGB', exif=None):
+        buffer = io.BytesIO()
+        image = Image.new(mode, size, 'teal')
+        params = {'exif': exif} if exif else {}
+        image.save(buffer, image_format, **params)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def clean(self, upload):
+        form = PostForm(data={'text': 'Пост'}, files={'image': upload})
+        valid = form.is_valid()
+        return valid, form
+
+    def test_large_photo_is_downscaled_rotated_and_stripped(self):
+        """Фото уменьшается, поворачивается по EXIF и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Телефон'
+        valid, form = self.clean(
+            self.make_upload('IMG_6737.JPG', (300, 200), exif=exif)
+        )
+        self.assertTrue(valid, form.errors)
+        upload = form.cleaned_data['image']
+        self.assertEqual(upload.name, 'IMG_6737.jpg')
+        image = Image.open(upload)
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (67, 100))
+        self.assertEqual(len(image.getexif()), 0)
+
+    def test_transparent_image_stays_png(self):
+        valid, form = self.clean(
+            self.make_upload('logo.png', (50, 50), 'PNG', 'RGBA')
+        )
+        self.assertTrue(valid, form.errors)
+        self.assertEqual(form.cleaned_data['image'].name, 'logo.png')
+        self.assertEqual(Image.open(form.cleaned_data['image']).mode, 'RGBA')
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_heavy_file_is_rejected(self):
+        valid, form = self.clean(self.make_upload('big.jpg', (300, 300)))
+        self.assertFalse(valid)
+        self.assertEqual(form.errors['image'][0], 'Файл больше 100\xa0байт.')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_huge_image_is_rejected(self):
+        valid, form = self.clean(self.make_upload('wide.png', (100, 50),
+                                                  'PNG'))
+        self.assertFalse(valid)
+        self.assertIn('100×50', form.errors['image'][0])
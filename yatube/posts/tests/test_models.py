@@ -1,6 +1,11 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.urls import reverse
 
-from posts.models import Group, Post, User
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -39,3 +44,82 @@ class GroupModelTest(TestCase):
         group = self.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class CountersTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='split')
+        self.follower = User.objects.create_user(username='zadar')
+        self.client.force_login(self.follower)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(author=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.client.post(
+            reverse('posts:add_comment', args=[self.follower, post.pk]),
+            {'text': 'Комментарий'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.follower).following_count, 1)
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.follower).following_count, 0)
+
+    def test_edit_does_not_overwrite_comment_count(self):
+        """Сохранение поста не затирает счётчик комментариев."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.follower, text='Ок')
+        stale.text = 'Исправленный пост'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_reconcile_counters_fixes_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        AuthorStats.objects.filter(author=self.author).update(
+            posts_count=10, followers_count=7
+        )
+        Post.objects.filter(pk=post.pk).update(comment_count=3)
+        AuthorStats.objects.filter(author=self.follower).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.follower).following_count, 1)
+
+
+class FollowModelTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='split')
+        self.author = User.objects.create_user(username='zadar')
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена в базе."""
+        Follow.objects.create(user=self.user, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
+
+    def test_explain_feeds_uses_indexes(self):
+        """Запросы лент выполняются по составным индексам."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(text='Пост', author=self.author)
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertIn('post_author_pub_date_idx', out.getvalue())
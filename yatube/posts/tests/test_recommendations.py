@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, Recommendation, User
+from posts.recommendations import Adjacency, compute, get_recommendations
+
+
+class AdjacencyTest(TestCase):
+
+    def test_rows(self):
+        """Строка матрицы — её столбцы, неизвестная строка пуста."""
+        matrix = Adjacency([(1, 5), (1, 7), (4, 2)])
+        self.assertEqual(list(matrix[1]), [5, 7])
+        self.assertEqual(list(matrix[4]), [2])
+        self.assertEqual(list(matrix[3]), [])
+        self.assertEqual(list(matrix[9]), [])
+        self.assertEqual(list(Adjacency([])[1]), [])
+
+
+class RecommendationsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('split', 'hannover', 'berlin', 'zagreb', 'pula')
+        }
+        self.follow('split', 'hannover')
+        self.follow('split', 'berlin')
+        self.follow('hannover', 'zagreb')
+        self.follow('berlin', 'zagreb')
+        self.follow('berlin', 'split')
+        self.follow('hannover', 'pula')
+
+    def follow(self, user, author):
+        Follow.objects.create(user=self.users[user], author=self.users[author])
+
+    def recommended(self, name):
+        return [
+            author.username
+            for author in get_recommendations(self.users[name])
+        ]
+
+    def test_friends_of_friends(self):
+        """Кандидаты ранжируются по числу общих подписок."""
+        self.assertEqual(compute(), 2)
+        self.assertEqual(self.recommended('split'), ['zagreb', 'pula'])
+        self.assertEqual(self.recommended('berlin'), ['hannover'])
+
+    def test_shared_groups(self):
+        """Авторы одних групп тоже становятся кандидатами."""
+        group = Group.objects.create(title='Хорватия', slug='croatia')
+        for name in ('zagreb', 'pula'):
+            Post.objects.create(text='Море', author=self.users[name],
+                                group=group)
+        compute()
+        self.assertEqual(self.recommended('pula'), ['zagreb'])
+        compute(max_group_size=1)
+        self.assertEqual(self.recommended('pula'), [])
+
+    def test_recompute_replaces_rows(self):
+        """Пересчёт заменяет прежние рекомендации, подписки скрываются."""
+        compute()
+        self.follow('split', 'zagreb')
+        self.assertEqual(self.recommended('split'), ['pula'])
+        compute(top=1)
+        self.assertEqual(
+            Recommendation.objects.filter(user=self.users['split']).count(),
+            1
+        )
+
+    def test_follow_page_shows_recommendations(self):
+        """Рекомендации видны на странице подписок."""
+        call_command('compute_recommendations', stdout=StringIO())
+        client = Client()
+        client.force_login(self.users['split'])
+        response = client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Возможно, вы знакомы')
+        self.assertContains(
+            response, reverse('posts:profile', args=['zagreb'])
+        )
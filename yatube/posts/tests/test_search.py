@@ -0,0 +1,150 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Group, Post, User
+from posts.stemmer import stem
+
+SEARCH_PAGE_URL = 'posts:search'
+
+
+class StemmerTest(TestCase):
+
+    def test_word_forms_share_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        for words in (('котов', 'коты', 'котам'),
+                      ('длинный', 'длинная', 'длинные'),
+                      ('ёлка', 'елки')):
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+    def test_latin_words_are_kept(self):
+        """Слова не на кириллице не меняются, кроме регистра."""
+        self.assertEqual(stem('Django'), 'django')
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='split', first_name='Иван', last_name='Петров'
+        )
+        self.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='Поездки'
+        )
+        self.post = Post.objects.create(
+            text='Видели в Хорватии диких котов',
+            author=self.user,
+            group=self.group
+        )
+        self.client = Client()
+
+    def find(self, query):
+        return list(search.SearchResults(query)[:10])
+
+    def test_finds_word_forms(self):
+        """Поиск находит пост по другой форме слова."""
+        self.assertEqual(self.find('дикий кот'), [self.post])
+        self.assertEqual(self.find('собаки'), [])
+
+    def test_indexes_comments_groups_and_authors(self):
+        """В индексе комментарии, название группы и имя автора."""
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Отличные фотографии')
+        for query in ('фотография', 'путешествие', 'Ивану', 'split'):
+            with self.subTest(query=query):
+                self.assertEqual(self.find(query), [self.post])
+
+    def test_index_follows_changes(self):
+        """Правки, переименования и удаления сразу видны в поиске."""
+        self.post.text = 'Видели в Хорватии диких собак'
+        self.post.save()
+        self.assertEqual(self.find('коты'), [])
+        self.assertEqual(self.find('собака'), [self.post])
+        self.group.title = 'Походы'
+        self.group.save()
+        self.assertEqual(self.find('поход'), [self.post])
+        self.user.last_name = 'Сидоров'
+        self.user.save()
+        self.assertEqual(self.find('Сидоров'), [self.post])
+        self.group.delete()
+        self.assertEqual(self.find('поход'), [])
+        self.post.delete()
+        self.assertEqual(self.find('собака'), [])
+
+    def test_words_may_match_post_and_comments(self):
+        """Слова запроса ищутся и в посте, и в разных комментариях."""
+        first = Comment.objects.create(post=self.post, author=self.user,
+                                       text='Отличные фотографии')
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Какое синее море')
+        self.assertEqual(self.find('кот фотография море'), [self.post])
+        self.assertEqual(search.get_backend().count('кот море'), 1)
+        first.delete()
+        self.assertEqual(self.find('кот фотография'), [])
+
+    def test_comment_save_indexes_only_that_comment(self):
+        """Новый комментарий не перечитывает остальные комментарии."""
+        for number in range(3):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text=f'Комментарий {number}')
+        comment = Comment(post=self.post, author=self.user,
+                          text='Отличные фотографии')
+        with mock.patch('posts.search.to_document',
+                        wraps=search.to_document) as to_document:
+            comment.save()
+        to_document.assert_called_once_with('Отличные фотографии')
+        self.assertEqual(self.find('фотография'), [self.post])
+
+    def test_text_matches_rank_first(self):
+        """Совпадение в тексте поста важнее, чем в комментарии."""
+        other = Post.objects.create(text='Пост про море', author=self.user)
+        Comment.objects.create(post=other, author=self.user,
+                               text='Котов там не было')
+        self.assertEqual(self.find('коты'), [self.post, other])
+
+    def test_query_syntax_is_escaped(self):
+        """Кавычки и операторы FTS5 в запросе не ломают поиск."""
+        for query in ('"кот', 'кот OR', 'NEAR(кот', '*', '-'):
+            with self.subTest(query=query):
+                self.find(query)
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_search_page_is_paginated(self):
+        """Страница поиска делится на страницы и помнит запрос."""
+        for number in range(3):
+            Post.objects.create(text=f'Коты номер {number}',
+                                author=self.user)
+        response = self.client.get(reverse(SEARCH_PAGE_URL),
+                                   {'q': 'кот', 'page': 2})
+        page = response.context['page']
+        self.assertEqual(page.paginator.count, 4)
+        self.assertEqual(len(page.object_list), 2)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&amp;page=1')
+
+    def test_empty_query_shows_form_only(self):
+        """Без запроса показывается только форма поиска."""
+        response = self.client.get(reverse(SEARCH_PAGE_URL))
+        self.assertIsNone(response.context['page'])
+        self.assertContains(response, 'name="q"')
+
+    def test_rebuild_command_restores_index(self):
+        """rebuild_search_index заполняет индекс заново."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+            cursor.execute(f'DELETE FROM {search.COMMENTS_TABLE}')
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Отличные фотографии')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.COMMENTS_TABLE}')
+        self.assertEqual(self.find('кот'), [])
+        self.assertEqual(self.find('фотография'), [])
+        call_command('rebuild_search_index', batch_size=1,
+                     stdout=StringIO())
+        self.assertEqual(self.find('кот'), [self.post])
+        self.assertEqual(self.find('фотография'), [self.post])
@@ -0,0 +1,229 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from posts import thumbnails
+from posts.models import Post, User
+
+CONTENT = b'GIF89a-first'
+OTHER_CONTENT = b'GIF89a-second'
+
+
+def run_on_commit(callback):
+    callback()
+
+
+def make_png():
+    buffer = BytesIO()
+    Image.new('RGB', (4, 3), 'plum').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(POST_THUMBNAIL_WORKERS=0)
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+class ContentAddressedStorageTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='split')
+        self.storage = Post._meta.get_field('image').storage
+
+    def create_post(self, content=CONTENT, name='IMG_6737.GIF'):
+        return Post.objects.create(
+            text='Пост',
+            author=self.user,
+            image=SimpleUploadedFile(name, content)
+        )
+
+    def test_name_is_content_digest(self):
+        """Имя файла — SHA-256 содержимого с исходным расширением."""
+        post = self.create_post()
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        self.assertEqual(post.image.name, f'posts/{digest[:2]}/{digest}.gif')
+        with post.image.open('rb') as file:
+            self.assertEqual(file.read(), CONTENT)
+
+    def test_same_content_is_stored_once(self):
+        """Повторная загрузка того же файла не занимает места."""
+        first = self.create_post(b'GIF89a-same')
+        second = self.create_post(b'GIF89a-same', name='copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        directory = first.image.name.rsplit('/', 1)[0]
+        self.assertEqual(len(self.storage.listdir(directory)[1]), 1)
+
+    def make_old(self, name):
+        old = time.time() - settings.MEDIA_RELEASE_MIN_AGE - 60
+        os.utime(self.storage.path(name), (old, old))
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется, когда на него не ссылается ни один пост."""
+        first = self.create_post()
+        second = self.create_post()
+        name = first.image.name
+        self.make_old(name)
+        first.delete()
+        self.assertTrue(self.storage.exists(name))
+        second.delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_reused_file_survives_release_before_insert(self):
+        """
+        Загрузка переиспользовала файл, а строка её поста ещё не
+        вставлена: удаление последнего старого поста файл не трогает.
+        """
+        post = self.create_post(b'GIF89a-shared')
+        name = post.image.name
+        self.make_old(name)
+        reused = self.storage.save('posts/copy.gif',
+                                   ContentFile(b'GIF89a-shared'))
+        self.assertEqual(reused, name)
+        post.delete()
+        self.assertTrue(self.storage.exists(name))
+        Post.objects.create(text='Копия', author=self.user, image=reused)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_replaced_image_is_released(self):
+        """При замене картинки в post_edit старый файл освобождается."""
+        post = Post.objects.get(pk=self.create_post().pk)
+        old_name = post.image.name
+        self.make_old(old_name)
+        post.image = SimpleUploadedFile('new.gif', OTHER_CONTENT)
+        post.save()
+        self.assertFalse(self.storage.exists(old_name))
+        self.assertTrue(self.storage.exists(post.image.name))
+
+    def test_migrate_media_moves_legacy_files(self):
+        """Старые файлы переносятся, дубликаты сливаются."""
+        legacy = []
+        for name in ('posts/IMG_6737.JPG', 'posts/IMG_6737_jAc52sn.JPG'):
+            path = FileSystemStorage().save(name, ContentFile(CONTENT))
+            legacy.append(path)
+        self.assertEqual(legacy[0], 'posts/IMG_6737.JPG')
+        for name in legacy:
+            Post.objects.create(text='Старый пост', author=self.user,
+                                image=name)
+        call_command('migrate_media', stdout=StringIO())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(self.storage.is_digest_name(names.pop()))
+        for name in legacy:
+            self.assertFalse(self.storage.exists(name))
+
+
+@override_settings(POST_THUMBNAIL_WORKERS=0)
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+@mock.patch('posts.thumbnails.transaction.on_commit', run_on_commit)
+class CollectMediaTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='split')
+        self.storage = Post._meta.get_field('image').storage
+        self.checkpoint = os.path.join(self.media_root, 'checkpoint.json')
+
+    def collect(self, **options):
+        out = StringIO()
+        call_command('collect_media', min_age=0, checkpoint=self.checkpoint,
+                     stdout=out, **options)
+        return out.getvalue()
+
+    def make_orphan(self, name, content=CONTENT):
+        return FileSystemStorage().save(name, ContentFile(content))
+
+    def test_orphans_are_deleted(self):
+        """Файлы без постов удаляются, файлы постов остаются."""
+        post = Post.objects.create(
+            text='Пост', author=self.user,
+            image=SimpleUploadedFile('kept.gif', b'GIF89a-kept')
+        )
+        orphan = self.make_orphan('posts/deleted.gif')
+        self.collect()
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(post.image.name))
+
+    def test_dry_run_only_reports(self):
+        """--dry-run показывает сирот, но не удаляет их."""
+        orphan = self.make_orphan('posts/reported.gif')
+        output = self.collect(dry_run=True)
+        self.assertIn(orphan, output)
+        self.assertTrue(self.storage.exists(orphan))
+
+    def test_orphan_variants_are_deleted(self):
+        """Каталог вариантов без исходника удаляется."""
+        post = Post.objects.create(
+            text='Пост', author=self.user,
+            image=SimpleUploadedFile('variants.png', make_png())
+        )
+        directory = thumbnails.get_directory(post.image.name)
+        self.assertTrue(default_storage.exists(f'{directory}/manifest.json'))
+        Post.objects.filter(pk=post.pk).update(image='')
+        self.collect()
+        self.assertFalse(default_storage.exists(directory))
+        self.assertFalse(self.storage.exists(post.image.name))
+
+    def test_orphan_sorl_thumbnails_are_deleted(self):
+        """Миниатюра sorl без поста с исходником удаляется."""
+        post = Post.objects.create(
+            text='Пост', author=self.user,
+            image=SimpleUploadedFile('sorl.png', make_png())
+        )
+        thumbnail = get_thumbnail(post.image, '2x2').name
+        orphan = self.make_orphan(f'cache/ab/cd/{"0" * 32}.jpg')
+        self.collect()
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(thumbnail))
+        Post.objects.filter(pk=post.pk).update(image='')
+        self.collect()
+        self.assertFalse(default_storage.exists(thumbnail))
+
+    def test_walk_resumes_from_checkpoint(self):
+        """Прерванный по --limit обход продолжается с места остановки."""
+        orphans = [
+            self.make_orphan(f'posts/{bucket}/orphan.gif', bucket.encode())
+            for bucket in ('00', '01')
+        ]
+        output = self.collect(batch_size=1, limit=1)
+        self.assertIn('прерван', output)
+        self.assertTrue(os.path.exists(self.checkpoint))
+        self.assertFalse(self.storage.exists(orphans[0]))
+        self.assertTrue(self.storage.exists(orphans[1]))
+        self.collect()
+        self.assertFalse(self.storage.exists(orphans[1]))
+        self.assertFalse(os.path.exists(self.checkpoint))
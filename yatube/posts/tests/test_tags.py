@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Mention, Post, PostTag, Tag, User
+from posts.tags import parse_mentions, parse_tags
+from posts.templatetags.post_text import link_tags
+
+TAG_PAGE_URL = 'posts:tag'
+MENTIONS_PAGE_URL = 'posts:mentions'
+
+
+class ParseTest(TestCase):
+
+    def test_parse_tags(self):
+        """Теги приводятся к нижнему регистру, повторы отбрасываются."""
+        self.assertEqual(
+            parse_tags('#Море и #море, #горы_2021! a#b &#39;'),
+            ['море', 'горы_2021']
+        )
+
+    def test_parse_mentions(self):
+        """Точка в конце упоминания — знак препинания."""
+        self.assertEqual(
+            parse_mentions('Привет, @split и @ivan.petrov. mail@example'),
+            ['split', 'ivan.petrov']
+        )
+
+
+class TagsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='split')
+        self.friend = User.objects.create_user(username='hannover')
+        self.client = Client()
+
+    def create_post(self, text):
+        return Post.objects.create(text=text, author=self.user)
+
+    def test_links_follow_post_text(self):
+        """Связи с тегами и упоминаниями обновляются при сохранении."""
+        post = self.create_post('#море с @hannover и @nobody')
+        self.assertEqual(
+            list(post.tag_links.values_list('tag__name', flat=True)),
+            ['море']
+        )
+        self.assertEqual(
+            list(post.mentions.values_list('user', flat=True)),
+            [self.friend.pk]
+        )
+        post.text = '#горы без упоминаний'
+        post.save()
+        self.assertEqual(
+            list(post.tag_links.values_list('tag__name', flat=True)),
+            ['горы']
+        )
+        self.assertFalse(post.mentions.exists())
+
+    def test_tag_page_uses_indexed_join(self):
+        """Лента тега строится соединением, а не поиском по тексту."""
+        tagged = self.create_post('Отпуск #Море')
+        self.create_post('Отпуск у моря')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse(TAG_PAGE_URL, args=['море'])
+            )
+        self.assertEqual(list(response.context['page']), [tagged])
+        self.assertFalse(any(
+            'LIKE' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_unknown_tag_is_404(self):
+        response = self.client.get(reverse(TAG_PAGE_URL, args=['нет']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_mentions_page(self):
+        """Лента упоминаний показывает посты с @username."""
+        mentioned = self.create_post('Спасибо, @hannover!')
+        self.create_post('Без упоминаний')
+        response = self.client.get(
+            reverse(MENTIONS_PAGE_URL, args=[self.friend.username])
+        )
+        self.assertEqual(list(response.context['page']), [mentioned])
+
+    def test_post_text_links(self):
+        """Теги и упоминания в тексте становятся ссылками."""
+        html = link_tags('<b>#Море</b> @hannover.')
+        self.assertIn('&lt;b&gt;', html)
+        self.assertIn(
+            f'<a href="{reverse(TAG_PAGE_URL, args=["море"])}">#Море</a>',
+            html
+        )
+        self.assertIn(
+            f'<a href="{reverse("posts:profile", args=["hannover"])}">'
+            f'@hannover</a>.',
+            html
+        )
+
+    def test_backfill_command(self):
+        """backfill_tags размечает посты, сохранённые без сигналов."""
+        Post.objects.bulk_create([
+            Post(text='#лето с @hannover', author=self.user),
+            Post(text='#лето', author=self.user),
+        ])
+        call_command('backfill_tags', batch_size=1, stdout=StringIO())
+        tag = Tag.objects.get(name='лето')
+        self.assertEqual(PostTag.objects.filter(tag=tag).count(), 2)
+        self.assertEqual(Mention.objects.filter(user=self.friend).count(), 1)
@@ -0,0 +1,164 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.caching import get_feed_version
+from posts.models import Post, User
+
+IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def run_on_commit(callback):
+    callback()
+
+
+def make_jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@override_settings(POST_THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='split')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, name='small.gif', content=IMAGE):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(name, content, 'image/jpeg')
+        )
+
+    def test_feed_shows_placeholder_until_ready(self):
+        """Пока вариантов нет, лента не ждёт их и показывает заглушку."""
+        post = self.create_post('new.jpg', make_jpeg(30, 20))
+        with mock.patch.object(thumbnails, 'render_variants') as render:
+            response = self.client.get(reverse('posts:index'))
+        render.assert_not_called()
+        self.assertContains(response, 'Картинка обрабатывается')
+        self.assertIsNone(thumbnails.get_manifest(post.image))
+
+    def test_feed_version_is_bumped_when_variants_are_ready(self):
+        """Готовые варианты сбрасывают кеш лент, повтор — нет."""
+        post = self.create_post('late.jpg', make_jpeg(40, 20))
+        version = get_feed_version()
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        run_on_commit):
+            thumbnails.generate(post.image)
+            ready = get_feed_version()
+            thumbnails.generate(post.image)
+        self.assertNotEqual(ready, version)
+        self.assertEqual(get_feed_version(), ready)
+
+    def test_variants_are_prepared_on_save(self):
+        """После сохранения поста варианты готовятся вне рендеринга."""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        run_on_commit):
+            post = self.create_post('photo.jpg', make_jpeg(2400, 1600))
+        manifest = thumbnails.get_manifest(post.image)
+        self.assertEqual(list(manifest), thumbnails.get_formats())
+        for name, variants in manifest.items():
+            with self.subTest(format=name):
+                self.assertEqual(
+                    [width for _, width, _ in variants],
+                    list(settings.POST_IMAGE_WIDTHS)
+                )
+                path, width, height = variants[0]
+                with default_storage.open(path) as file:
+                    variant = Image.open(file)
+                    self.assertEqual(variant.format, name)
+                    self.assertEqual(variant.size, (width, height))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, ' 320w, ')
+        self.assertNotContains(response, 'Картинка обрабатывается')
+
+    def test_small_image_is_not_upscaled_past_feed_width(self):
+        """Маленькая картинка растягивается не шире основной ширины."""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        run_on_commit):
+            post = self.create_post()
+        widths = [
+            width for _, width, _
+            in thumbnails.get_manifest(post.image)['JPEG']
+        ]
+        self.assertEqual(max(widths), settings.POST_IMAGE_DEFAULT_WIDTH)
+
+    def test_missing_variants_are_scheduled_from_template(self):
+        """Старые картинки без вариантов ставятся в очередь при показе."""
+        post = self.create_post()
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        run_on_commit):
+            self.client.get(reverse('posts:index'))
+        cache.clear()
+        self.assertIsNotNone(thumbnails.get_manifest(post.image))
+
+    def test_manifest_is_stored_in_post_row(self):
+        """Манифест копируется в строки всех постов с картинкой."""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        run_on_commit):
+            first = self.create_post()
+            second = self.create_post()
+        for post in Post.objects.filter(pk__in=[first.pk, second.pk]):
+            self.assertEqual(post.variants,
+                             thumbnails.get_manifest(post.image))
+
+    def test_feed_reads_manifest_without_cache(self):
+        """Лента с готовыми манифестами не обращается к кешу."""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        run_on_commit):
+            self.create_post()
+        with mock.patch.object(thumbnails, 'get_manifest') as get_manifest:
+            response = self.client.get(reverse('posts:index'))
+        get_manifest.assert_not_called()
+        self.assertContains(response, '<picture>')
+
+    def test_rebuild_command_restores_manifests_from_disk(self):
+        """rebuild_image_variants заполняет манифесты по диску."""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        run_on_commit):
+            post = self.create_post()
+        Post.objects.update(image_variants='')
+        cache.clear()
+        call_command('rebuild_image_variants', batch_size=1,
+                     stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.variants,
+                         thumbnails.read_manifest(post.image.name))
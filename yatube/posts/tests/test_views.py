@@ -1,14 +1,26 @@
+import base64
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 
-from posts.models import Follow, Group, Post, User
+from posts import thumbnails, timeline
+from posts.caching import FEED_PAGE_KEY, get_feed_version
+from posts.models import (COMMENT_MAX_DEPTH, Comment, Follow, Group, Post,
+                          User)
+from posts.profiles import get_profile_summary
 
 HOME_PAGE_URL = 'posts:index'
 NEW_POST_PAGE_URL = 'posts:new_post'
@@ -19,6 +31,10 @@ PROFILE_FOLLOW_PAGE_URL = 'posts:profile_follow'
 PROFILE_UNFOLLOW_PAGE = 'posts:profile_unfollow'
 
 
+def run_on_commit(callback):
+    callback()
+
+
 @override_settings(MEDIA_ROOT=(settings.BASE_DIR + '/media'))
 class PostsPagesTests(TestCase):
 
@@ -103,6 +119,8 @@ class PostsPagesTests(TestCase):
             )
         self.follow = Follow.objects.create(user=self.user, author=self.user2)
         self.bulk = Post.objects.bulk_create(self.objs)
+        # bulk_create не отправляет сигналы, счётчики сверяем вручную
+        call_command('reconcile_counters', stdout=StringIO())
         self.post_edit_page_url = 'posts:edit_post'
         self.post_page_url = 'posts:post'
 
@@ -138,6 +156,51 @@ class PostsPagesTests(TestCase):
                     2
                 )
 
+    def test_cursor_paginator(self):
+        """Курсорная навигация вперёд и назад по ленте."""
+        url = reverse(HOME_PAGE_URL)
+        first_page = self.client.get(url).context['page']
+        next_cursor = first_page.paginator.next_cursor
+        Post.objects.create(author=self.user, text=self.CACHE_TEST_POST)
+        second_page = self.client.get(
+            url, {'cursor': next_cursor}
+        ).context['page']
+        self.assertEqual(len(first_page.object_list), 10)
+        self.assertEqual(len(second_page.object_list), 2)
+        self.assertEqual(second_page.object_list[1], self.post_at)
+        self.assertFalse(second_page.has_next())
+        previous_page = self.client.get(
+            url, {'cursor': second_page.paginator.previous_cursor}
+        ).context['page']
+        self.assertEqual(
+            list(previous_page.object_list),
+            list(first_page.object_list)
+        )
+        self.assertTrue(previous_page.has_previous())
+
+    def test_cursor_paginator_ignores_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу ленты."""
+        cursors = ['broken'] + [
+            base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+            for raw in (
+                '["n",[[1],1]]',
+                '["n",[1,1]]',
+                '["n",["2020-01-01T00:00:00",1e400]]',
+                '["n",["2020-01-01T00:00:00",99999999999999999999999]]',
+                '["n",["2020-01-01T00:00:00",true]]',
+            )
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse(HOME_PAGE_URL), {'cursor': cursor}
+                )
+                page = response.context['page']
+                self.assertEqual(len(page.object_list), 10)
+                self.assertFalse(page.has_previous())
+                api = self.client.get('/api/v1/posts/', {'cursor': cursor})
+                self.assertEqual(api.status_code, 200)
+
     def test_home_page_shows_correct_context(self):
         """Шаблон index сформирован с правильным контекстом."""
         response = self.authorized_client.get(reverse(HOME_PAGE_URL))
@@ -213,8 +276,12 @@ class PostsPagesTests(TestCase):
         response = self.authorized_client.get(
             reverse(PROFILE_PAGE_URL, kwargs={'username': self.USERNAME})
         )
-        self.assertEqual(len(response.context['posts']), 12)
+        stats = response.context['profile_user'].stats
+        self.assertEqual(stats.posts_count, 12)
+        self.assertEqual(stats.followers_count, 0)
+        self.assertEqual(stats.following_count, 1)
         self.assertEqual(response.context['profile_user'], self.user)
+        self.assertEqual(len(response.context['page'].object_list), 10)
         self.assertEqual(
             response.context['page'].object_list[0].text,
             'Hello World!'
@@ -235,7 +302,10 @@ class PostsPagesTests(TestCase):
                 kwargs={'username': self.USERNAME, 'post_id': self.post_at.pk}
             )
         )
-        self.assertEqual(len(response.context['posts']), 12)
+        self.assertEqual(
+            response.context['profile_user'].stats.posts_count,
+            12
+        )
         self.assertEqual(response.context['profile_user'], self.user)
         self.assertEqual(
             response.context['post'].text,
@@ -275,6 +345,7 @@ class PostsPagesTests(TestCase):
             []
         )
 
+    @mock.patch('posts.signals.transaction.on_commit', run_on_commit)
     def test_cache(self):
         """Тестирование кеша"""
         cache.clear()  # почистили кеш
@@ -282,25 +353,65 @@ class PostsPagesTests(TestCase):
             author=self.user,
             text=self.CACHE_TEST_POST
         )  # создали пост
-        response_home_page_2_one = self.authorized_client.get(
+        response_home_page_2_one = self.client.get(
             reverse(HOME_PAGE_URL) + '?page=2'
         )  # проверили что пост появился (12 + 1 = 13)
+        with self.assertNumQueries(0):
+            self.client.get(reverse(HOME_PAGE_URL) + '?page=2')
         Post.objects.create(
             author=self.user,
             text=self.CACHE_TEST_POST
         )  # создали еще один пост
-        response_home_page_2_two = self.authorized_client.get(
+        response_home_page_2_two = self.client.get(
             reverse(HOME_PAGE_URL) + '?page=2'
-        )  # проверили что пост не появился (12 + 1 = 13)
+        )  # кеш сброшен сразу, пост появился (12 + 2 = 14)
         self.assertEqual(
             len(response_home_page_2_one.context['page'].object_list),
             3
         )
         self.assertEqual(
             len(response_home_page_2_two.context['page'].object_list),
-            3
+            4
         )
 
+    def test_feed_version_changes_after_commit(self):
+        """Версия лент меняется только после фиксации транзакции."""
+        version = get_feed_version()
+        callbacks = []
+        with mock.patch('posts.signals.transaction.on_commit',
+                        callbacks.append):
+            Post.objects.create(author=self.user, text=self.CACHE_TEST_POST)
+        self.assertEqual(get_feed_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_feed_version(), version)
+
+    def test_cache_keys_use_validated_page(self):
+        """В кеш попадают только страницы, проверенные paginator-ом."""
+        cache.clear()
+        version = get_feed_version()
+
+        def cached(mode, position):
+            return cache.get(FEED_PAGE_KEY.format(
+                name='index', version=version, mode=mode, position=position
+            ))
+
+        url = reverse(HOME_PAGE_URL)
+        for query in ('?page=abc', '?page=100500', '?cursor=garbage'):
+            with self.subTest(query=query):
+                self.client.get(url + query)
+        self.assertIsNone(cached('page', 'abc'))
+        self.assertIsNone(cached('page', '100500'))
+        self.assertIsNone(cached('cursor', 'garbage'))
+        self.assertIsNotNone(cached('page', '1'))
+        self.assertIsNotNone(cached('page', '2'))
+        self.assertIsNotNone(cached('cursor', ''))
+        page = self.client.get(url).context['page']
+        cursor = page.paginator.next_cursor
+        self.client.get(url + '?cursor=' + cursor)
+        with self.assertNumQueries(0):
+            self.client.get(url + '?cursor=' + cursor)
+
     def test_auth_user_could_subscribe(self):
         """Авторизованный пользователь может подписываться"""
         counter_before_subscription = Follow.objects.count()
@@ -357,3 +468,488 @@ class PostsPagesTests(TestCase):
             ),
             response_u1.context['page'].object_list
         )
+
+    @mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+    def test_follow_timeline_is_updated_on_write(self):
+        """Посты и подписки дописываются в собранную ленту без пересборки."""
+        timeline.get_timeline(self.user)
+        post = Post.objects.create(
+            author=self.user2,
+            text=self.SUBSCRIPTION_POST_TEXT
+        )
+        with self.assertNumQueries(0):
+            entries = timeline.get_timeline(self.user)
+        self.assertEqual([entry[1] for entry in entries], [post.pk])
+        Follow.objects.create(user=self.user, author=self.user3)
+        with self.assertNumQueries(0):
+            entries = timeline.get_timeline(self.user)
+        self.assertEqual(
+            [entry[1] for entry in entries],
+            [post.pk, *Post.objects.filter(author=self.user3)
+             .order_by('-pub_date').values_list('pk', flat=True)]
+        )
+        self.authorized_client.get(
+            reverse(PROFILE_UNFOLLOW_PAGE, args=[self.user2.username])
+        )
+        with self.assertNumQueries(0):
+            entries = timeline.get_timeline(self.user)
+        self.assertNotIn(post.pk, [entry[1] for entry in entries])
+
+    def test_follow_timeline_concurrent_updates_are_not_lost(self):
+        """Правка, опоздавшая за чужой, не затирает её, а сбрасывает ленту."""
+        post = Post.objects.create(
+            author=self.user2,
+            text=self.SUBSCRIPTION_POST_TEXT
+        )
+        timeline.get_timeline(self.user)
+        next_version = timeline._next_version
+
+        def racing_next_version(user_id):
+            # Чужая правка увеличивает версию между чтением и записью.
+            next_version(user_id)
+            return next_version(user_id)
+
+        with mock.patch.object(timeline, '_next_version',
+                               racing_next_version):
+            timeline._update([self.user.pk], lambda entries: [])
+        with self.assertNumQueries(1):
+            entries = timeline.get_timeline(self.user)
+        self.assertEqual([entry[1] for entry in entries], [post.pk])
+
+    def test_follow_timeline_is_not_lost_on_concurrent_write(self):
+        """Лента, собранная до фиксации чужой записи, не остаётся в кеше."""
+        callbacks = []
+        entries = timeline._entries
+
+        def build_and_commit(queryset):
+            # Запрос к базе уже выполнен, когда чужая транзакция
+            # создаёт пост и после фиксации выдаёт ленте новую версию.
+            result = entries(queryset)
+            Post.objects.create(
+                author=self.user2,
+                text=self.SUBSCRIPTION_POST_TEXT
+            )
+            for callback in callbacks:
+                callback()
+            return result
+
+        with mock.patch('posts.signals.transaction.on_commit',
+                        callbacks.append):
+            with mock.patch.object(timeline, '_entries', build_and_commit):
+                stale = timeline.get_timeline(self.user)
+        post = Post.objects.get(text=self.SUBSCRIPTION_POST_TEXT)
+        self.assertNotIn(post.pk, [entry[1] for entry in stale])
+        self.assertEqual(
+            [entry[1] for entry in timeline.get_timeline(self.user)],
+            [post.pk]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    @mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+    def test_follow_timeline_merges_popular_authors_on_read(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении."""
+        cache.clear()
+        self.authorized_client.get(reverse(FOLLOW_PAGE_URL))
+        post = Post.objects.create(
+            author=self.user2,
+            text=self.SUBSCRIPTION_POST_TEXT
+        )
+        version = cache.get(timeline._version_key(self.user.pk))
+        self.assertEqual(cache.get(timeline._key(self.user.pk, version)), [])
+        response = self.authorized_client.get(reverse(FOLLOW_PAGE_URL))
+        self.assertEqual(list(response.context['page'].object_list), [post])
+
+
+class FeedQueriesTests(TestCase):
+
+    USERNAME = 'split'
+    GROUP_SLUG = 'dubrovnik'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=self.USERNAME)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='Дубровник',
+            slug=self.GROUP_SLUG
+        )
+        for number in range(10):
+            post = Post.objects.create(
+                author=self.user,
+                text=f'Пост {number}',
+                group=self.group
+            )
+            Comment.objects.create(post=post, author=self.user, text='Ок')
+        Follow.objects.create(
+            user=User.objects.create_user(username='zadar'),
+            author=self.user
+        )
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with self.settings(POSTS_PER_PAGE=per_page):
+            with CaptureQueriesContext(connection) as context:
+                response = self.authorized_client.get(url)
+        self.assertEqual(len(response.context['page']), per_page)
+        return len(context)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от размера страницы."""
+        urls = (
+            reverse(HOME_PAGE_URL),
+            reverse(GROUP_PAGE_URL, args=[self.GROUP_SLUG]),
+            reverse(PROFILE_PAGE_URL, args=[self.USERNAME]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 2),
+                    self.count_queries(url, 8)
+                )
+
+    def test_feed_shows_comment_count(self):
+        """Число комментариев в ленте берётся из аннотации."""
+        response = self.authorized_client.get(reverse(HOME_PAGE_URL))
+        self.assertEqual(response.context['page'][0].comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='split')
+        self.group = Group.objects.create(
+            title='Хорватия', slug='croatia', description='Поездки'
+        )
+        self.post = Post.objects.create(
+            text='Дубровник', author=self.user, group=self.group
+        )
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_unchanged_page_is_not_modified(self):
+        """Страница без изменений отдаётся как 304."""
+        urls = (
+            reverse(HOME_PAGE_URL),
+            reverse(GROUP_PAGE_URL, args=[self.group.slug]),
+            reverse(PROFILE_PAGE_URL, args=[self.user.username]),
+            reverse('posts:post', args=[self.user.username, self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('Last-Modified', response)
+                repeated = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(repeated.status_code, 304)
+
+    def test_last_modified_is_page_freshness(self):
+        """Last-Modified поста — время последнего комментария."""
+        url = reverse('posts:post', args=[self.user.username, self.post.pk])
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Красиво'
+        )
+        response = self.guest_client.get(url)
+        self.assertEqual(
+            response['Last-Modified'], http_date(comment.created.timestamp())
+        )
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = reverse('posts:post', args=[self.user.username, self.post.pk])
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_ready_image_variants_change_etag(self):
+        """Готовые варианты картинки меняют ETag страниц с постом."""
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            post = Post.objects.create(
+                text='Сплит', author=self.user, group=self.group,
+                image=SimpleUploadedFile('split.gif', PostsPagesTests.IMAGE,
+                                         'image/gif')
+            )
+            url = reverse(GROUP_PAGE_URL, args=[self.group.slug])
+            etag = self.guest_client.get(url)['ETag']
+            manifest = {'JPEG': [['variants/split.jpg', 2, 1]]}
+            with mock.patch.object(thumbnails, 'render_variants',
+                                   return_value=manifest), \
+                    mock.patch('posts.thumbnails.transaction.on_commit',
+                               lambda callback: callback()):
+                thumbnails.generate(post.image)
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cache_control_depends_on_user(self):
+        """Анонимам — общий кеш с Vary: Cookie, остальным — личный."""
+        url = reverse(HOME_PAGE_URL)
+        guest = self.guest_client.get(url)
+        self.assertIn('public', guest['Cache-Control'])
+        self.assertIn('Cookie', guest['Vary'])
+        authorized = self.authorized_client.get(url)
+        self.assertIn('private', authorized['Cache-Control'])
+        self.assertNotEqual(guest['ETag'], authorized['ETag'])
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentPagesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='split')
+        self.post = Post.objects.create(text='Дубровник', author=self.user)
+        self.client = Client()
+
+    def add_comments(self, count):
+        start = Comment.objects.count()
+        authors = [
+            User.objects.create_user(username=f'reader{index}')
+            for index in range(start, start + count)
+        ]
+        for author in authors:
+            Comment.objects.create(post=self.post, author=author,
+                                   text=f'Комментарий {author.username}')
+
+    def count_queries(self):
+        cache.clear()
+        url = reverse('posts:post', args=[self.user.username, self.post.pk])
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return len(context)
+
+    def test_query_count_does_not_depend_on_comments(self):
+        """Число запросов поста не зависит от числа комментариев."""
+        self.add_comments(2)
+        few = self.count_queries()
+        self.add_comments(6)
+        self.assertEqual(self.count_queries(), few)
+
+    def test_comments_are_loaded_page_by_page(self):
+        """Первые комментарии в посте, остальные — по «Показать ещё»."""
+        self.add_comments(5)
+        response = self.client.get(
+            reverse('posts:post', args=[self.user.username, self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.author.username for comment in comments],
+            ['reader0', 'reader1', 'reader2']
+        )
+        more_url = (
+            reverse('posts:post_comments',
+                    args=[self.user.username, self.post.pk])
+            + '?cursor=' + comments.paginator.next_cursor
+        )
+        self.assertContains(response, more_url)
+        more = self.client.get(more_url)
+        self.assertEqual(
+            [comment.author.username for comment in more.context['comments']],
+            ['reader3', 'reader4']
+        )
+        self.assertNotContains(more, 'Показать ещё')
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentThreadTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='split')
+        self.post = Post.objects.create(text='Дубровник', author=self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def reply(self, parent, text):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text=text, parent=parent
+        )
+
+    def test_replies_follow_their_parent(self):
+        """Ветка идёт в порядке обхода: ответ сразу за родителем."""
+        first = self.reply(None, 'первый')
+        second = self.reply(None, 'второй')
+        self.reply(first, 'ответ первому')
+        self.reply(second, 'ответ второму')
+        answer = first.replies.get()
+        self.reply(answer, 'ответ на ответ')
+        self.assertEqual(
+            [c.text for c in Comment.objects.thread(self.post.pk)],
+            ['первый', 'ответ первому', 'ответ на ответ',
+             'второй', 'ответ второму']
+        )
+        self.assertEqual(
+            [c.depth for c in Comment.objects.thread(self.post.pk)],
+            [0, 1, 2, 0, 1]
+        )
+
+    def test_subtree_is_one_query(self):
+        """Ответы на комментарий любой глубины читаются одним запросом."""
+        root = self.reply(None, 'корень')
+        parent = root
+        for level in range(5):
+            parent = self.reply(parent, f'уровень {level}')
+        self.reply(None, 'соседний')
+        with self.assertNumQueries(1):
+            texts = [c.text for c in Comment.objects.subtree(root)]
+        self.assertEqual(texts, [f'уровень {level}' for level in range(5)])
+        self.assertEqual(
+            [c.text for c in Comment.objects.subtree(root, depth=2)],
+            ['уровень 0', 'уровень 1']
+        )
+
+    def test_deep_replies_stop_at_max_depth(self):
+        """Ответ глубже COMMENT_MAX_DEPTH остаётся на последнем уровне."""
+        parent = self.reply(None, 'корень')
+        for level in range(COMMENT_MAX_DEPTH + 3):
+            parent = self.reply(parent, f'уровень {level}')
+        self.assertEqual(parent.depth, COMMENT_MAX_DEPTH)
+        self.assertEqual(
+            Comment.objects.filter(depth__gt=COMMENT_MAX_DEPTH).count(), 0
+        )
+
+    def test_add_comment_with_parent(self):
+        """Ответ через форму привязывается к комментарию этого поста."""
+        parent = self.reply(None, 'вопрос')
+        other = Post.objects.create(text='Чужой', author=self.user)
+        foreign = Comment.objects.create(
+            post=other, author=self.user, text='чужой'
+        )
+        url = reverse('posts:add_comment',
+                      args=[self.user.username, self.post.pk])
+        self.client.post(url, {'text': 'ответ', 'parent': parent.pk})
+        self.client.post(url, {'text': 'мимо', 'parent': foreign.pk})
+        self.assertEqual(Comment.objects.get(text='ответ').parent, parent)
+        self.assertIsNone(Comment.objects.get(text='мимо').parent)
+
+    def test_bad_numbers_are_ignored(self):
+        """Нецифровые и огромные номера считаются отсутствующими."""
+        post_url = reverse('posts:post',
+                           args=[self.user.username, self.post.pk])
+        branch_url = reverse('posts:post_comments',
+                             args=[self.user.username, self.post.pk])
+        huge = '9' * 23
+        for url, params in (
+                (post_url, {'reply': '²'}),
+                (post_url, {'reply': huge}),
+                (branch_url, {'root': '²'}),
+                (branch_url, {'root': huge}),
+                (branch_url, {'depth': huge}),
+                (branch_url, {'depth': '-1'})):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code,
+                                 200)
+        url = reverse('posts:add_comment',
+                      args=[self.user.username, self.post.pk])
+        for parent in ('²', huge):
+            self.client.post(url, {'text': parent, 'parent': parent})
+            self.assertIsNone(Comment.objects.get(text=parent).parent)
+
+    def test_reply_link_fills_form(self):
+        """?reply= подставляет комментарий в форму ответа."""
+        parent = self.reply(None, 'вопрос')
+        response = self.client.get(
+            reverse('posts:post', args=[self.user.username, self.post.pk]),
+            {'reply': parent.pk}
+        )
+        self.assertContains(
+            response, f'name="parent" value="{parent.pk}"'
+        )
+
+    def test_branch_fragment_is_bounded(self):
+        """Фрагмент ветки ограничен по глубине и по ширине."""
+        root = self.reply(None, 'корень')
+        child = self.reply(root, 'ребёнок')
+        self.reply(child, 'внук')
+        for index in range(4):
+            self.reply(root, f'ответ {index}')
+        url = reverse('posts:post_comments',
+                      args=[self.user.username, self.post.pk])
+        response = self.client.get(url, {'root': root.pk, 'depth': 1})
+        comments = response.context['comments']
+        self.assertEqual(
+            [c.text for c in comments],
+            ['ребёнок', 'ответ 0', 'ответ 1']
+        )
+        # Продолжить можно только ветку, в которой есть ответы.
+        self.assertContains(response, 'Продолжить ветку', count=1)
+        self.assertContains(
+            response, f'?root={child.pk}&amp;depth=1">Продолжить ветку'
+        )
+        self.assertContains(
+            response, f'?root={root.pk}&amp;depth=1&amp;cursor='
+        )
+
+
+@mock.patch('posts.signals.transaction.on_commit', lambda callback: callback())
+class ProfileSummaryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='split', first_name='Иван', last_name='Петров'
+        )
+        self.reader = User.objects.create_user(username='hannover')
+        self.post = Post.objects.create(text='Дубровник', author=self.author)
+        self.factory = RequestFactory()
+
+    def get_summary(self):
+        request = self.factory.get('/')
+        request.user = self.reader
+        return get_profile_summary(request, self.author.username)
+
+    def test_cached_summary_needs_no_queries(self):
+        """Повторная сводка берётся из кеша без запросов к базе."""
+        self.get_summary()
+        with self.assertNumQueries(0):
+            summary = self.get_summary()
+        self.assertEqual(summary.display_name, 'Иван Петров')
+        self.assertEqual(summary.posts_count, 1)
+        self.assertFalse(summary.following)
+
+    def test_summary_follows_changes(self):
+        """Подписка, новый пост и смена имени видны сразу."""
+        self.get_summary()
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='Сплит', author=self.author)
+        self.author.first_name = 'Пётр'
+        self.author.save()
+        summary = self.get_summary()
+        self.assertTrue(summary.following)
+        self.assertEqual(summary.followers_count, 1)
+        self.assertEqual(summary.posts_count, 2)
+        self.assertEqual(summary.display_name, 'Пётр Петров')
+
+    def test_other_authors_do_not_expire_summary(self):
+        """Пост и подписки другого автора не сбрасывают сводку."""
+        other = User.objects.create_user(username='zagreb')
+        self.get_summary()
+        Post.objects.create(text='Загреб', author=other)
+        Follow.objects.create(user=other, author=self.reader)
+        with self.assertNumQueries(0):
+            self.get_summary()
+
+    def test_renamed_author_summary_is_404(self):
+        """Сводка под старым именем после переименования — 404."""
+        self.get_summary()
+        username = self.author.username
+        self.author.username = 'zadar'
+        self.author.save()
+        request = self.factory.get('/')
+        request.user = self.reader
+        with self.assertRaises(Http404):
+            get_profile_summary(request, username)
+
+    def test_unknown_author_is_404(self):
+        """Сводка несуществующего автора — 404."""
+        request = self.factory.get('/')
+        request.user = self.reader
+        with self.assertRaises(Http404):
+            get_profile_summary(request, 'nobody')
@@ -0,0 +1,260 @@
+"""
+Варианты картинок постов готовятся в фоне, а не при рендеринге.
+
+После сохранения поста с картинкой задача уходит в пул потоков.
+Исходник декодируется один раз, кадрируется под пропорции ленты
+и сохраняется в ширинах POST_IMAGE_WIDTHS во всех форматах
+POST_IMAGE_FORMATS, которые умеет Pillow. Рядом записывается
+манифест вариантов, а его копия — в поле Post.image_variants
+всех постов с этой картинкой: страница ленты получает манифесты
+вместе со строками постов, без запросов к кешу и диску. До
+появления манифеста шаблоны показывают заглушку.
+"""
+import hashlib
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+from sorl.thumbnail.engines import pil_engine
+
+from .caching import bump_feed_version
+
+logger = logging.getLogger(__name__)
+
+# Формат Pillow → (расширение, MIME-тип, параметры сохранения).
+FORMATS = {
+    'AVIF': ('avif', 'image/avif', {'quality': 50}),
+    'WEBP': ('webp', 'image/webp', {'quality': 75, 'method': 4}),
+    'JPEG': ('jpg', 'image/jpeg',
+             {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+FALLBACK_FORMAT = 'JPEG'
+VARIANTS_DIR = 'cache/variants'
+# Имя исходника рядом с вариантами: по нему сборщик мусора
+# сверяет каталог вариантов с Post.image.
+SOURCE_FILE = 'source'
+MANIFEST_KEY = 'post_image:{digest}'
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class Engine(pil_engine.Engine):
+    """
+    PIL-движок sorl для Pillow 10+, где убрана константа
+    Image.ANTIALIAS; LANCZOS — тот же фильтр.
+    """
+
+    def _scale(self, image, width, height):
+        return image.resize((width, height), resample=Image.LANCZOS)
+
+
+def get_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые поддерживает Pillow."""
+    return [
+        name for name in settings.POST_IMAGE_FORMATS
+        if name == FALLBACK_FORMAT or features.check(name.lower())
+    ]
+
+
+def get_digest(name):
+    return hashlib.md5(name.encode()).hexdigest()
+
+
+def get_directory(name):
+    digest = get_digest(name)
+    return f'{VARIANTS_DIR}/{digest[:2]}/{digest}'
+
+
+def crop_box(size):
+    """Центральная область исходника в пропорциях POST_IMAGE_ASPECT."""
+    width, height = size
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    if width * aspect_height > height * aspect_width:
+        crop_width = max(1, height * aspect_width // aspect_height)
+        left = (width - crop_width) // 2
+        return left, 0, left + crop_width, height
+    crop_height = max(1, width * aspect_height // aspect_width)
+    top = (height - crop_height) // 2
+    return 0, top, width, top + crop_height
+
+
+def get_widths(source_width):
+    """
+    Ширины вариантов по убыванию. Больше исходника картинка
+    растягивается только до основной ширины ленты.
+    """
+    limit = max(source_width, settings.POST_IMAGE_DEFAULT_WIDTH)
+    return sorted(
+        (width for width in settings.POST_IMAGE_WIDTHS if width <= limit),
+        reverse=True
+    )
+
+
+def open_source(image, largest):
+    """
+    Декодирует исходник; JPEG сразу в уменьшенном масштабе,
+    достаточном для самого крупного варианта.
+    """
+    with image.open('rb') as file:
+        source = Image.open(file)
+        if source.format == 'JPEG':
+            source.draft('RGB', (largest, largest))
+        return ImageOps.exif_transpose(source).convert('RGB')
+
+
+def render_variants(image):
+    """Создаёт все варианты картинки и возвращает манифест."""
+    source = open_source(image, max(settings.POST_IMAGE_WIDTHS))
+    frame = source.crop(crop_box(source.size))
+    directory = get_directory(image.name)
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    formats = get_formats()
+    manifest = {name: [] for name in formats}
+    for width in get_widths(frame.width):
+        height = max(1, round(width * aspect_height / aspect_width))
+        # Каждый следующий вариант уменьшается из предыдущего.
+        frame = frame.resize((width, height), Image.LANCZOS)
+        for name in formats:
+            extension, _, options = FORMATS[name]
+            path = f'{directory}/{width}.{extension}'
+            if not default_storage.exists(path):
+                buffer = io.BytesIO()
+                frame.save(buffer, format=name, **options)
+                default_storage.save(path, ContentFile(buffer.getvalue()))
+            manifest[name].insert(0, [path, width, height])
+    default_storage.delete(f'{directory}/{SOURCE_FILE}')
+    default_storage.save(f'{directory}/{SOURCE_FILE}',
+                         ContentFile(image.name.encode()))
+    default_storage.delete(f'{directory}/manifest.json')
+    default_storage.save(
+        f'{directory}/manifest.json',
+        ContentFile(json.dumps(manifest).encode())
+    )
+    return manifest
+
+
+def read_manifest(name):
+    """Манифест картинки с именем name с диска или None."""
+    path = f'{get_directory(name)}/manifest.json'
+    if not default_storage.exists(path):
+        return None
+    with default_storage.open(path, 'rb') as file:
+        return json.loads(file.read().decode())
+
+
+def get_manifest(image):
+    """
+    Манифест вариантов {формат: [[путь, ширина, высота], ...]}
+    по возрастанию ширины или None, если варианты ещё не готовы.
+    """
+    key = MANIFEST_KEY.format(digest=get_digest(image.name))
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest = read_manifest(image.name)
+        if manifest is None:
+            return None
+        cache.set(key, manifest, timeout=None)
+    return manifest
+
+
+def store_manifest(name, manifest):
+    """
+    Записывает манифест в кеш и в строки всех постов с картинкой
+    name, сбрасывает кеш лент. Возвращает число обновлённых постов.
+    """
+    from .models import Post
+
+    cache.set(MANIFEST_KEY.format(digest=get_digest(name)), manifest,
+              timeout=None)
+    data = json.dumps(manifest)
+    updated = (
+        Post.objects.filter(image=name).exclude(image_variants=data)
+        .update(image_variants=data)
+    )
+    if updated:
+        # update() не шлёт сигналов: закешированные страницы лент
+        # и их ETag всё ещё показывают заглушку.
+        transaction.on_commit(bump_feed_version)
+    return updated
+
+
+def delete_directory(directory):
+    """Удаляет файлы каталога вариантов directory."""
+    if not default_storage.exists(directory):
+        return
+    for filename in default_storage.listdir(directory)[1]:
+        default_storage.delete(f'{directory}/{filename}')
+
+
+def delete_variants(name):
+    """Удаляет варианты и манифест картинки с именем name."""
+    cache.delete(MANIFEST_KEY.format(digest=get_digest(name)))
+    delete_directory(get_directory(name))
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+    return _executor
+
+
+def generate(image):
+    """
+    Готовит варианты картинки; вызывается в потоке пула. Картинка
+    с уже готовым манифестом (тот же файл у другого поста)
+    повторно не декодируется: манифест только копируется в посты.
+    """
+    try:
+        manifest = get_manifest(image)
+        if manifest is None:
+            manifest = render_variants(image)
+        store_manifest(image.name, manifest)
+    except Exception:
+        logger.exception('Не удалось подготовить картинку %s', image.name)
+    finally:
+        with _lock:
+            _pending.discard(image.name)
+
+
+def _work(image):
+    try:
+        generate(image)
+    finally:
+        # Поток пула мог открыть своё соединение с базой.
+        connections.close_all()
+
+
+def _submit(image):
+    with _lock:
+        if image.name in _pending:
+            return
+        _pending.add(image.name)
+    if settings.POST_THUMBNAIL_WORKERS:
+        get_executor().submit(_work, image)
+    else:
+        generate(image)
+
+
+def schedule(image):
+    """
+    Ставит картинку в очередь. Задача уходит после фиксации
+    транзакции, чтобы поток пула видел и файл, и строку поста.
+    POST_THUMBNAIL_WORKERS = 0 выполняет её сразу в текущем потоке.
+    """
+    if image:
+        transaction.on_commit(lambda: _submit(image))
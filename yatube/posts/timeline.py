@@ -0,0 +1,188 @@
+"""
+Материализованная лента подписок (fan-out on write).
+
+Для каждого пользователя в кеше хранится ограниченный список записей
+(pub_date, post_id, author_id) от новых к старым. Ключ списка включает
+номер версии ленты, и записанный под номером список больше не
+меняется. Новый пост после фиксации транзакции дописывается в ленты
+подписчиков автора, подписка и отписка дописывают или вычищают посты
+автора. Правка атомарно увеличивает версию (cache.incr) и кладёт
+исправленный список под новый номер, только если номер следует сразу
+за прочитанным: иначе между чтением и правкой ленту успел поменять
+кто-то ещё, список под новым номером не появится, и лента будет
+пересобрана из базы при чтении. Авторы, у которых подписчиков больше
+TIMELINE_FANOUT_LIMIT, ленты не трогают: их свежие посты
+подмешиваются при чтении.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+
+from . import follow_graph
+from .models import AuthorStats, Post
+
+TIMELINE_KEY = 'timeline:{}:{}'
+TIMELINE_VERSION_KEY = 'timeline:{}:version'
+CELEBRITIES_KEY = 'timeline:celebrities'
+FANOUT_BATCH_SIZE = 500
+
+
+def _key(user_id, version):
+    return TIMELINE_KEY.format(user_id, version)
+
+
+def _version_key(user_id):
+    return TIMELINE_VERSION_KEY.format(user_id)
+
+
+def _entries(queryset):
+    return [
+        (pub_date.timestamp(), pk, author_id)
+        for pub_date, pk, author_id in queryset.values_list(
+            'pub_date', 'pk', 'author_id'
+        )[:settings.TIMELINE_SIZE]
+    ]
+
+
+def _merge(entries, new_entries):
+    known = {entry[1] for entry in entries}
+    entries = entries + [
+        entry for entry in new_entries if entry[1] not in known
+    ]
+    entries.sort(reverse=True)
+    return entries[:settings.TIMELINE_SIZE]
+
+
+def get_celebrities():
+    """Авторы, посты которых подмешиваются в ленты при чтении."""
+    def compute():
+        return set(
+            AuthorStats.objects.filter(
+                followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+            ).values_list('author_id', flat=True)
+        )
+    return cache.get_or_set(
+        CELEBRITIES_KEY,
+        compute,
+        timeout=settings.TIMELINE_CELEBRITIES_TIMEOUT
+    )
+
+
+def _new_version(user_id):
+    """Создаёт версию ленты, если её нет, и возвращает текущую."""
+    # Начинаем с метки времени, чтобы после вытеснения счётчика
+    # не вернуться к номеру, список под которым ещё лежит в кеше.
+    cache.add(_version_key(user_id), time.time_ns(),
+              timeout=settings.TIMELINE_TIMEOUT)
+    return cache.get(_version_key(user_id))
+
+
+def _next_version(user_id):
+    try:
+        return cache.incr(_version_key(user_id))
+    except ValueError:
+        _new_version(user_id)
+        return cache.incr(_version_key(user_id))
+
+
+def _update(user_ids, change):
+    """
+    Правит собранные ленты user_ids: change(entries) возвращает
+    новый список. Вызывается после фиксации транзакции, поэтому
+    лента, пересобранная из базы вместо правки, её уже учтёт.
+    """
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), FANOUT_BATCH_SIZE):
+        batch = user_ids[start:start + FANOUT_BATCH_SIZE]
+        versions = cache.get_many([_version_key(pk) for pk in batch])
+        versions = {
+            pk: versions[_version_key(pk)] for pk in batch
+            if _version_key(pk) in versions
+        }
+        timelines = cache.get_many([
+            _key(pk, version) for pk, version in versions.items()
+        ])
+        updated = {}
+        for pk in batch:
+            version = versions.get(pk)
+            # Номер увеличивается и у лент, которых нет в кеше: их
+            # может собирать чтение, начавшееся до фиксации.
+            new_version = _next_version(pk)
+            entries = timelines.get(_key(pk, version))
+            if entries is not None and new_version == version + 1:
+                updated[_key(pk, new_version)] = change(entries)
+        cache.set_many(updated, timeout=settings.TIMELINE_TIMEOUT)
+
+
+def push_post(post):
+    """Дописывает новый пост в ленты подписчиков автора."""
+    if post.author_id in get_celebrities():
+        return
+    entry = (post.pub_date.timestamp(), post.pk, post.author_id)
+    _update(
+        follow_graph.get_followers(post.author_id),
+        lambda entries: _merge(entries, [entry])
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты нового автора."""
+    if author_id in get_celebrities():
+        return
+    _update([user_id], lambda entries: _merge(
+        entries, _entries(Post.objects.filter(author_id=author_id))
+    ))
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора, от которого он отписался."""
+    _update([user_id], lambda entries: [
+        entry for entry in entries if entry[2] != author_id
+    ])
+
+
+def get_timeline(user):
+    """Лента подписок пользователя с подмешанными постами «звёзд»."""
+    celebrities = get_celebrities()
+    # Версия читается до запроса к базе: если запись зафиксируется
+    # после него, она увеличит версию, и собранный список останется
+    # под старым номером.
+    version = cache.get(_version_key(user.pk)) or _new_version(user.pk)
+    entries = cache.get(_key(user.pk, version))
+    if entries is None:
+        entries = _entries(
+            Post.objects.filter(author__following__user=user)
+            .exclude(author_id__in=celebrities)
+        )
+        cache.add(_key(user.pk, version), entries,
+                  timeout=settings.TIMELINE_TIMEOUT)
+    if celebrities:
+        followed = [
+            author_id for author_id in follow_graph.get_following(user.pk)
+            if author_id in celebrities
+        ]
+        entries = _merge(
+            entries, _entries(Post.objects.filter(author_id__in=followed))
+        )
+    return entries
+
+
+def get_page(user, page_number):
+    """
+    Страница ленты подписок: номера постов берутся из ленты,
+    сами посты загружаются одним запросом. Удалённые посты
+    и устаревшие записи отбрасываются.
+    """
+    page = Paginator(
+        get_timeline(user), settings.POSTS_PER_PAGE
+    ).get_page(page_number)
+    posts = Post.objects.for_feed().in_bulk(
+        [entry[1] for entry in page.object_list]
+    )
+    page.object_list = [
+        posts[pk] for _, pk, author_id in page.object_list
+        if pk in posts and posts[pk].author_id == author_id
+    ]
+    return page
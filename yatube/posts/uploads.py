@@ -0,0 +1,93 @@
+"""
+Нормализация картинок при загрузке.
+
+Размер файла и размеры картинки по заголовку проверяются ещё
+до декодирования: слишком тяжёлые файлы и слишком большие
+изображения отклоняются. Остальные поворачиваются по EXIF,
+уменьшаются до POST_IMAGE_MAX_DIMENSION и перекодируются без
+метаданных. JPEG декодируется сразу в уменьшенном масштабе,
+а уменьшение и поворот выполняются на месте, без второй
+полноразмерной копии в памяти.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Анимацию GIF не перекодируем, чтобы не потерять кадры.
+KEEP_FORMATS = ('GIF',)
+
+
+def check_size(file):
+    if file.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={
+                'limit': filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+            }
+        )
+
+
+def check_dimensions(image):
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: %(width)s×%(height)s.',
+            code='image_too_large',
+            params={'width': width, 'height': height}
+        )
+
+
+def output_format(image):
+    """JPEG, если в картинке нет прозрачности, иначе PNG."""
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        return 'PNG'
+    return 'JPEG'
+
+
+def normalize_image(file):
+    """
+    Возвращает загруженный файл, готовый к сохранению, или бросает
+    ValidationError. GIF только проверяются.
+    """
+    check_size(file)
+    file.seek(0)
+    image = Image.open(file)
+    check_dimensions(image)
+    if image.format in KEEP_FORMATS:
+        file.seek(0)
+        return file
+    limit = settings.POST_IMAGE_MAX_DIMENSION
+    if image.format == 'JPEG':
+        image.draft('RGB', (limit, limit))
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    ImageOps.exif_transpose(image, in_place=True)
+    target = output_format(image)
+    if target == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    # Без exif=... Pillow не переносит метаданные в новый файл.
+    if target == 'JPEG':
+        image.save(
+            buffer,
+            'JPEG',
+            quality=settings.POST_IMAGE_QUALITY,
+            optimize=True,
+            progressive=True,
+            icc_profile=image.info.get('icc_profile')
+        )
+        extension = '.jpg'
+    else:
+        image.save(buffer, 'PNG', optimize=True)
+        extension = '.png'
+    stem = os.path.splitext(os.path.basename(file.name))[0]
+    return SimpleUploadedFile(
+        stem + extension,
+        buffer.getvalue(),
+        content_type=Image.MIME[target]
+    )
@@ -10,6 +10,8 @@ urlpatterns = [
     path('500/', views.server_error, name='500'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('tag/<str:tag>/', views.tag_posts, name='tag'),
     path(
         '<str:username>/follow/',
         views.profile_follow,
@@ -21,10 +23,16 @@ urlpatterns = [
         name='profile_unfollow'
     ),
     path('group/<slug:slug>/', views.group_posts, name='group'),
+    path('<str:username>/mentions/', views.mentions, name='mentions'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/', views.post_edit,
          name='edit_post'),
+    path(
+        '<str:username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         '<str:username>/<int:post_id>/comment/',
         views.add_comment,
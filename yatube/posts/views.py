@@ -1,86 +1,173 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import freshness
+from .caching import cached_page
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .freshness import conditional_page
+from .models import COMMENT_MAX_DEPTH, Comment, Follow, Group, Post, Tag, User
+from .paginators import MAX_INTEGER, CursorPaginator, paginate
+from .profiles import get_profile_summary
+from .recommendations import get_recommendations
+from .search import SearchResults
+from .timeline import get_page as get_timeline_page
 
 
+@conditional_page()
 def index(request):
-    post_list = cache.get('index_page')
-    if post_list is None:
-        post_list = Post.objects.select_related('group').all()
-        cache.set('index_page', post_list, timeout=20)
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = cached_page(
+        request,
+        'index',
+        lambda: paginate(request, Post.objects.for_feed())
+    )
     return render(request, 'posts/index.html', {'page': page})
 
 
+@conditional_page(freshness.group_posts)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page = paginate(request, post_list)
     return render(request, 'posts/group.html',
                   {'group': group, 'page': page})
 
 
-def profile(request, username):
+def tag_posts(request, tag):
+    tag = get_object_or_404(Tag, name=tag.lower())
+    post_list = Post.objects.filter(tag_links__tag=tag).for_feed()
+    page = paginate(request, post_list)
+    return render(request, 'posts/tag.html', {'tag': tag, 'page': page})
+
+
+def mentions(request, username):
     user = get_object_or_404(User, username=username)
-    followers = User.objects.filter(following__author=user)
-    following = User.objects.filter(follower__user=user)
-    posts = Post.objects.filter(author=user)
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    if request.user.is_authenticated:
-        follow_bool = False
-        if Follow.objects.filter(user=request.user, author=user).exists():
-            follow_bool = True
-    else:
-        follow_bool = False
+    post_list = Post.objects.filter(mentions__user=user).for_feed()
+    page = paginate(request, post_list)
+    return render(request, 'posts/mentions.html',
+                  {'profile_user': user, 'page': page})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        page = Paginator(
+            SearchResults(query), settings.POSTS_PER_PAGE
+        ).get_page(request.GET.get('page'))
+    return render(request, 'posts/search.html',
+                  {'query': query, 'page': page})
+
+
+@conditional_page(freshness.profile, freshness.PROFILE_KEYS)
+def profile(request, username):
+    summary = get_profile_summary(request, username)
+    page = paginate(
+        request, Post.objects.filter(author=summary.author).for_feed()
+    )
     context = {
-        'profile_user': user,
-        'posts': posts,
+        'summary': summary,
+        'profile_user': summary.author,
         'page': page,
-        'followers': followers,
-        'following': following,
-        'follow_bool': follow_bool,
+        'follow_bool': summary.following,
     }
+    if request.user == summary.author:
+        context['recommendations'] = get_recommendations(request.user)
     return render(request, 'posts/profile.html', context)
 
 
+def get_comments_page(post_id, cursor=None, root=None, depth=None):
+    """
+    Страница ветки комментариев поста в порядке обхода в глубину:
+    ответы идут сразу за тем, на что отвечают. Ветка читается
+    по индексу (post, path) одним запросом без рекурсии, размер
+    страницы ограничен. root — показать только ответы на этот
+    комментарий, depth — не глубже стольких уровней.
+    """
+    if root is not None:
+        comments = Comment.objects.subtree(root, depth)
+    else:
+        comments = Comment.objects.thread(post_id)
+        if depth is not None:
+            comments = comments.filter(depth__lte=depth)
+    if depth is not None:
+        # Ветку нижнего уровня можно продолжить, только если она есть.
+        comments = comments.with_has_replies()
+    return CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ordering=('path',)
+    ).get_page(cursor)
+
+
+def parse_int(value, maximum=MAX_INTEGER):
+    """Целое от 0 до maximum из параметра запроса; мусор — None."""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if 0 <= number <= maximum else None
+
+
+def get_int(request, name, maximum=MAX_INTEGER):
+    return parse_int(request.GET.get(name), maximum)
+
+
+@conditional_page(freshness.post_view, freshness.PROFILE_KEYS)
 def post_view(request, username, post_id):
-    user = get_object_or_404(User, username=username)
-    followers = User.objects.filter(following__author=user)
-    following = User.objects.filter(follower__user=user)
-    posts = Post.objects.filter(author=user)
-    post = get_object_or_404(Post, author=user, pk=post_id)
-    comments = Comment.objects.filter(post=post_id)
+    summary = get_profile_summary(request, username)
+    post = get_object_or_404(
+        Post.objects.for_feed(), author=summary.author, pk=post_id
+    )
+    comments = get_comments_page(post.pk)
     form = CommentForm()
-    if request.user.is_authenticated:
-        follow_bool = False
-        if Follow.objects.filter(user=request.user, author=user).exists():
-            follow_bool = True
-    else:
-        follow_bool = False
+    reply_to = get_int(request, 'reply')
+    if reply_to is not None:
+        reply_to = Comment.objects.filter(post=post, pk=reply_to).first()
     context = {
-        'profile_user': user,
-        'posts': posts,
+        'summary': summary,
+        'profile_user': summary.author,
         'post': post,
         'form': form,
         'comments': comments,
-        'followers': followers,
-        'following': following,
-        'follow_bool': follow_bool,
+        'reply_to': reply_to,
+        'follow_bool': summary.following,
     }
     return render(request, 'posts/post.html', context)
 
 
+@conditional_page(freshness.post_view)
+def post_comments(request, username, post_id):
+    """
+    Следующая страница комментариев для кнопки «Показать ещё»,
+    ?root= — ответы на один комментарий, ?depth= — ограничение
+    глубины.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related('author').only('id', 'author__username'),
+        author__username=username,
+        pk=post_id
+    )
+    root = get_int(request, 'root')
+    if root is not None:
+        root = get_object_or_404(
+            Comment.objects.only('post_id', 'path', 'depth'),
+            post=post, pk=root
+        )
+    depth = get_int(request, 'depth', COMMENT_MAX_DEPTH)
+    comments = get_comments_page(
+        post.pk, request.GET.get('cursor'), root, depth
+    )
+    return render(request, 'includes/posts/comment_list.html', {
+        'post': post,
+        'comments': comments,
+        'root': root,
+        'depth': depth,
+        'max_depth': None if depth is None else (
+            depth + (root.depth if root else 0)
+        ),
+    })
+
+
 @login_required
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -133,6 +220,13 @@ def add_comment(request, post_id, username):
         new_comment = form.save(commit=False)
         new_comment.post = post_add_comment
         new_comment.author = user_who_adds_comment
+        # Поле parent не входит в форму: ответ на несуществующий или
+        # чужой комментарий становится комментарием верхнего уровня.
+        parent = parse_int(request.POST.get('parent'))
+        if parent is not None:
+            new_comment.parent = Comment.objects.filter(
+                post=post_add_comment, pk=parent
+            ).first()
         new_comment.save()
         return redirect(
             'posts:post',
@@ -147,12 +241,13 @@ def add_comment(request, post_id, username):
 
 
 @login_required
+@conditional_page(keys=freshness.PROFILE_KEYS)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {'page': page}
+    page = get_timeline_page(request.user, request.GET.get('page'))
+    context = {
+        'page': page,
+        'recommendations': get_recommendations(request.user),
+    }
     return render(request, 'posts/follow.html', context)
 
 
@@ -96,6 +96,20 @@ CACHES = {
     }
 }
 
+# Общий кеш для нескольких воркеров: redis://host:port/db.
+# Перед хранилищем стоит локальный уровень каждого процесса,
+# изменения рассылаются остальным процессам через pub/sub.
+CACHE_URL = os.environ.get('YATUBE_CACHE_URL')
+if CACHE_URL:
+    CACHES['default'] = {
+        'BACKEND': 'core.cache.backends.NearCache',
+        'LOCATION': CACHE_URL,
+        'OPTIONS': {
+            'NEAR_TIMEOUT': 5,
+            'NEAR_MAX_ENTRIES': 5000,
+        },
+    }
+
 LANGUAGE_CODE = 'ru'
 
 TIME_ZONE = 'UTC'
@@ -116,9 +130,55 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+PAGINATOR_APPROXIMATE_COUNT = True
+PAGINATOR_COUNT_TIMEOUT = 60
+FEED_PAGE_CACHE_TIMEOUT = 60 * 15
+PROFILE_SUMMARY_CACHE_TIMEOUT = 60 * 15
+# Сколько секунд общие кеши могут отдавать страницы анонимам
+# без перепроверки, см. posts.freshness.
+HTML_CACHE_MAX_AGE = 60
+
+TIMELINE_SIZE = 800
+TIMELINE_TIMEOUT = 60 * 60 * 24
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_CELEBRITIES_TIMEOUT = 60 * 5
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+# Сколько рекомендаций хранить на пользователя и сколько показывать,
+# см. posts.recommendations.
+RECOMMENDATIONS_PER_USER = 20
+RECOMMENDATIONS_SHOWN = 5
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файл картинки без ссылок удаляется сразу, только если его не
+# записывали и не переиспользовали дольше стольких секунд; свежие
+# сироты убирает collect_media, см. posts.media.release_image.
+MEDIA_RELEASE_MIN_AGE = 60 * 60
+
+THUMBNAIL_ENGINE = 'posts.thumbnails.Engine'
+
+# Варианты картинок постов: кадр в пропорциях POST_IMAGE_ASPECT
+# в каждой ширине и каждом формате, который поддерживает Pillow.
+# Готовятся в фоне после сохранения поста, 0 потоков — сразу.
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
+POST_IMAGE_DEFAULT_WIDTH = 960
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_SIZES = '(min-width: 992px) 960px, 100vw'
+POST_THUMBNAIL_WORKERS = 2
+
+# Загрузка картинок: больше POST_IMAGE_MAX_UPLOAD_SIZE байт или
+# POST_IMAGE_MAX_PIXELS пикселей отклоняется, больше
+# POST_IMAGE_MAX_DIMENSION по длинной стороне уменьшается.
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_DIMENSION = 2560
+POST_IMAGE_QUALITY = 85
+
+# Хранилище поискового индекса постов, см. posts.search.
+POST_SEARCH_BACKEND = 'posts.search.SQLiteBackend'